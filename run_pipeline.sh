@@ -12,6 +12,7 @@ echo "======================================"
 if [[ "${1:-}" == "--clean" ]]; then
     echo "Cleaning workspace..."
     rm -rf data/processed/*
+    rm -rf data/cache
     rm -rf submission_output/*
     rm -rf .snakemake
     echo "Clean-all complete."
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+artifact_cache.py
+
+Content-addressed on-disk cache for intermediate pipeline artifacts
+(dosage store, QC mask, GRM, eigendecomposition, fitted model, CV results).
+Includes:
+  - keys from a hash of input file contents + parameters
+  - file digests memoized on (size, mtime) so large CSVs are hashed once
+  - artifacts stored as .npy files, re-opened memory-mapped
+  - size-based LRU eviction
+
+An artifact is a dict of name → ndarray / DataFrame / JSON-able value.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+class ArtifactCache:
+    """
+    Usage:
+        cache = ArtifactCache("data/cache", max_bytes=8 * 2**30)
+        grm = cache.get_or_compute(
+            "grm", build_fn, inputs=[geno_path], params={"missing": "mean"}
+        )
+    build_fn() must return a dict; the cached copy comes back with
+    arrays memory-mapped read-only.
+    """
+
+    def __init__(self, root, max_bytes=8 * 2**30):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._digest_path = os.path.join(root, "file_digests.json")
+
+    # ------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------
+
+    def file_digest(self, path):
+        """
+        SHA-256 of a file (or of every file under a directory).
+        Digests are memoized on (size, mtime), so unchanged inputs
+        are not re-read.
+        """
+
+        if os.path.isdir(path):
+            h = hashlib.sha256()
+            for dirpath, _, files in sorted(os.walk(path)):
+                for name in sorted(files):
+                    full = os.path.join(dirpath, name)
+                    h.update(os.path.relpath(full, path).encode())
+                    h.update(self.file_digest(full).encode())
+            return h.hexdigest()
+
+        memo = self._load_digests()
+        st = os.stat(path)
+        stamp = [st.st_size, st.st_mtime_ns]
+        entry = memo.get(os.path.abspath(path))
+        if entry is not None and entry["stamp"] == stamp:
+            return entry["sha256"]
+
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+
+        memo[os.path.abspath(path)] = {"stamp": stamp, "sha256": h.hexdigest()}
+        with open(self._digest_path, "w") as f:
+            json.dump(memo, f)
+
+        return h.hexdigest()
+
+    def _load_digests(self):
+        if not os.path.exists(self._digest_path):
+            return {}
+        with open(self._digest_path) as f:
+            return json.load(f)
+
+    def key(self, name, inputs=(), params=None):
+        """
+        Content key for an artifact: its name, the digests of its input
+        files/directories (or the hash of in-memory arrays / DataFrames /
+        upstream keys), and its parameters.
+        """
+
+        h = hashlib.sha256(name.encode())
+
+        for item in inputs:
+            if isinstance(item, str) and os.path.exists(item):
+                h.update(self.file_digest(item).encode())
+            elif isinstance(item, pd.DataFrame):
+                h.update(pd.util.hash_pandas_object(item, index=False).to_numpy().tobytes())
+                h.update(json.dumps(list(map(str, item.columns))).encode())
+            elif isinstance(item, np.ndarray):
+                h.update(np.ascontiguousarray(item).tobytes())
+            else:
+                h.update(json.dumps(item, sort_keys=True, default=str).encode())
+
+        h.update(json.dumps(params or {}, sort_keys=True, default=str).encode())
+
+        return h.hexdigest()[:24]
+
+    # ------------------------------------------------------------
+    # Load / save
+    # ------------------------------------------------------------
+
+    def _dir(self, name, key):
+        return os.path.join(self.root, f"{name}-{key}")
+
+    def path_for(self, name, inputs=(), params=None):
+        """Directory holding the artifact for (inputs, params)."""
+        return self._dir(name, self.key(name, inputs, params))
+
+    def load(self, name, key):
+        """Load an artifact (arrays memory-mapped), or None on a miss."""
+
+        path = self._dir(name, key)
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+        out = {}
+        for field, spec in meta["fields"].items():
+            if spec["kind"] == "array":
+                out[field] = np.load(os.path.join(path, f"{field}.npy"), mmap_mode="r")
+            elif spec["kind"] == "frame":
+                out[field] = pd.DataFrame({
+                    col: np.load(os.path.join(path, f"{field}.{i}.npy"), mmap_mode="r")
+                    for i, col in enumerate(spec["columns"])
+                })
+            else:
+                out[field] = spec["value"]
+
+        # Mark as recently used for LRU eviction
+        os.utime(meta_path)
+
+        return out
+
+    def save(self, name, key, artifact):
+        """Write an artifact atomically, then evict old entries if over budget."""
+
+        tmp = tempfile.mkdtemp(dir=self.root, prefix=".tmp-")
+        fields = {}
+
+        for field, value in artifact.items():
+            if isinstance(value, pd.DataFrame):
+                for i, col in enumerate(value.columns):
+                    np.save(os.path.join(tmp, f"{field}.{i}.npy"), _to_npy(value[col]))
+                fields[field] = {"kind": "frame", "columns": [str(c) for c in value.columns]}
+            elif isinstance(value, (np.ndarray, pd.Index)):
+                np.save(os.path.join(tmp, f"{field}.npy"), _to_npy(value))
+                fields[field] = {"kind": "array"}
+            else:
+                fields[field] = {"kind": "json", "value": value}
+
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({"name": name, "key": key, "fields": fields}, f, default=_json_default)
+
+        dest = self._dir(name, key)
+        shutil.rmtree(dest, ignore_errors=True)
+        os.replace(tmp, dest)
+
+        self.evict(keep=dest)
+
+    def get_or_compute(self, name, compute, inputs=(), params=None):
+        """Return the cached artifact for (inputs, params), computing it on a miss."""
+
+        key = self.key(name, inputs, params)
+        cached = self.load(name, key)
+        if cached is not None:
+            print(f"✓ Cache hit: {name} [{key}]")
+            return cached
+
+        artifact = compute()
+        self.save(name, key, artifact)
+        print(f"✓ Cached: {name} [{key}]")
+
+        return self.load(name, key)
+
+    # ------------------------------------------------------------
+    # Eviction
+    # ------------------------------------------------------------
+
+    def evict(self, keep=None):
+        """Delete least-recently-used artifacts until under max_bytes."""
+
+        entries = []
+        for entry in os.listdir(self.root):
+            path = os.path.join(self.root, entry)
+            meta_path = os.path.join(path, "meta.json")
+            if entry.startswith(".") or not os.path.exists(meta_path):
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)
+            )
+            entries.append((os.path.getmtime(meta_path), size, path))
+
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            print(f"Evicted cached artifact: {os.path.basename(path)}")
+
+
+def _to_npy(values):
+    """Convert to an array np.load can memory-map (no object dtype)."""
+    arr = np.asarray(values)
+    if arr.dtype == object:
+        arr = arr.astype(str)
+    return arr
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+blues.py
+
+First-stage adjustment of plot-level phenotypes into genotype BLUEs.
+Includes:
+  - per-trial fixed-effect model: genotype + replicate + block(replicate)
+  - sparse design matrices (never densified)
+  - genotype absorption + conjugate-gradient solve of the nuisance system
+  - trials processed in parallel
+  - second stage combining per-trial BLUEs with trial effects
+
+Designed for multi-million-plot historical datasets.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import cg
+
+
+# ============================================================
+# Sparse design helpers
+# ============================================================
+
+def _factor_codes(*columns):
+    """
+    Integer codes for the combination of one or more key columns
+    (missing values become their own level).
+    Returns (codes, levels), levels being a DataFrame with one row per
+    level and one column per key, sorted lexicographically.
+    """
+    combined = np.zeros(len(columns[0]), dtype=np.int64)
+    uniques = []
+    for col in columns:
+        col_codes, col_uniques = pd.factorize(col, sort=True, use_na_sentinel=False)
+        combined = combined * len(col_uniques) + col_codes
+        uniques.append(col_uniques)
+
+    keys, codes = np.unique(combined, return_inverse=True)
+
+    levels = {}
+    for i in reversed(range(len(uniques))):
+        levels[i] = np.asarray(uniques[i])[keys % len(uniques[i])]
+        keys = keys // len(uniques[i])
+
+    return codes, pd.DataFrame({i: levels[i] for i in range(len(uniques))})
+
+
+def _indicator(codes, n_levels, drop=None):
+    """
+    Sparse one-hot matrix (rows × levels).
+    `drop` is a boolean mask of levels to leave out (reference levels).
+    """
+    n = len(codes)
+    X = sparse.csr_matrix(
+        (np.ones(n), (np.arange(n), codes)), shape=(n, n_levels)
+    )
+    if drop is not None:
+        X = X[:, np.flatnonzero(~drop)]
+    return X
+
+
+def _solve_absorbed(g_codes, n_g, N, y, w=None):
+    """
+    Least-squares solution of y = G g + N c for a genotype factor G
+    (one-hot, one column per level) and sparse nuisance design N.
+
+    G'G is diagonal, so genotypes are absorbed and only the nuisance
+    system is solved (with CG, which tolerates the singular Schur
+    complement of a confounded design):
+        S c = N'y - N'G D^(-1) G'y,   S = N'N - N'G D^(-1) G'N,  D = G'G
+        g   = D^(-1) (G'y - G'N c)
+    Optional weights w multiply each squared residual.
+    """
+
+    w = np.ones(len(y)) if w is None else w
+
+    D = np.bincount(g_codes, weights=w, minlength=n_g)
+    Gy = np.bincount(g_codes, weights=w * y, minlength=n_g)
+
+    if N.shape[1] == 0:
+        return Gy / D, np.zeros(0)
+
+    Nw = sparse.diags(w) @ N
+    G = _indicator(g_codes, n_g)
+    NG = (Nw.T @ G).tocsr()
+    NG_Dinv = NG @ sparse.diags(1.0 / D)
+
+    S = (Nw.T @ N) - NG_Dinv @ NG.T
+    rhs = Nw.T @ y - NG_Dinv @ Gy
+
+    c, info = cg(S, rhs, rtol=1e-10, maxiter=10 * S.shape[0])
+    if info > 0:
+        print(f"Warning: CG did not converge after {info} iterations")
+    g = (Gy - NG.T @ c) / D
+
+    return g, c
+
+
+# ============================================================
+# Stage 1: per-trial genotype BLUEs
+# ============================================================
+
+def trial_blues(pheno, trial_col="studyName"):
+    """
+    Genotype BLUEs within each trial from the model
+        y = genotype(trial) + replicate(trial) + block(replicate) + e
+
+    Any number of trials is solved as one stacked sparse system; the
+    nuisance equations are block-diagonal across trials, so this equals
+    fitting each trial separately without a Python loop over trials.
+    Genotype-in-trial enters with one column per level; the first
+    replicate of each trial and first block of each replicate are
+    references. BLUEs are least-squares means, i.e. averaged over the
+    trial's replicate and block levels.
+    Returns: studyName | germplasmName | blue | n_plots
+    """
+
+    # Plots without a trial or genotype label cannot be placed in the model
+    df = pheno[pheno["value"].notna() & pheno[trial_col].notna() & pheno["germplasmName"].notna()]
+    y = df["value"].to_numpy(dtype=float)
+
+    # Factorize each key column once; combinations are built on int codes
+    trial, trial_names = pd.factorize(df[trial_col], sort=True)
+    germ, germ_names = pd.factorize(df["germplasmName"], sort=True)
+    if "replicate" in df.columns:
+        rep = pd.factorize(df["replicate"], use_na_sentinel=False)[0]
+    else:
+        rep = np.zeros(len(df), dtype=np.int64)
+
+    g_codes, g_levels = _factor_codes(trial, germ)
+    trials = pd.Index(np.unique(g_levels[0]))
+
+    # Nuisance factors nested in trial: (trial, rep) and (trial, rep, block)
+    factors = [_factor_codes(trial, rep)]
+    if "block" in df.columns:
+        block = pd.factorize(df["block"], use_na_sentinel=False)[0]
+        factors.append(_factor_codes(trial, rep, block))
+
+    design = []
+    level_trials = []
+    for codes, levels in factors:
+        # Reference = first level within the enclosing factor
+        drop = ~levels.iloc[:, :-1].duplicated().to_numpy()
+        design.append(_indicator(codes, len(levels), drop))
+        level_trials.append((drop, trials.get_indexer(levels[0])))
+
+    N = sparse.hstack(design, format="csr")
+    n_g = len(g_levels)
+    blue, c = _solve_absorbed(g_codes, n_g, N, y)
+
+    # Least-squares means: add each trial's average nuisance effect
+    # (reference levels count as 0)
+    g_trial = trials.get_indexer(g_levels[0])
+    offset = 0
+    for drop, t_codes in level_trials:
+        effects = np.zeros(len(drop))
+        effects[~drop] = c[offset:offset + int((~drop).sum())]
+        offset += int((~drop).sum())
+
+        trial_mean = (
+            np.bincount(t_codes, weights=effects, minlength=len(trials))
+            / np.bincount(t_codes, minlength=len(trials))
+        )
+        blue += trial_mean[g_trial]
+
+    return pd.DataFrame({
+        trial_col: np.asarray(trial_names)[g_levels[0]],
+        "germplasmName": np.asarray(germ_names)[g_levels[1]],
+        "blue": blue,
+        "n_plots": np.bincount(g_codes, minlength=n_g),
+    })
+
+
+def compute_trial_blues(pheno, n_jobs=None, trial_col="studyName"):
+    """
+    Per-trial genotype BLUEs for a long-format plot-level phenotype table
+    (germplasmName, value, studyName and optionally replicate / block).
+    Trials are split into chunks that are solved in parallel processes.
+    """
+
+    cols = [c for c in ["germplasmName", "value", trial_col, "replicate", "block"]
+            if c in pheno.columns]
+    pheno = pheno[cols]
+    pheno = pheno[pheno[trial_col].notna() & pheno["germplasmName"].notna()]
+
+    trials = pheno[trial_col].unique()
+    n_chunks = min(len(trials), 4 * (n_jobs or os.cpu_count() or 1))
+    chunks = [
+        pheno[pheno[trial_col].isin(t)]
+        for t in np.array_split(trials, n_chunks)
+    ]
+
+    print(f"Computing BLUEs for {len(trials)} trials in {n_chunks} chunks...")
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        results = list(pool.map(partial(trial_blues, trial_col=trial_col), chunks))
+
+    blues = pd.concat(results, ignore_index=True)
+
+    print(f"✓ Per-trial BLUEs: {len(blues)} genotype × trial records")
+
+    return blues
+
+
+# ============================================================
+# Stage 2: combine trials
+# ============================================================
+
+def combine_trial_blues(blues, trial_col="studyName"):
+    """
+    Combine per-trial BLUEs into one value per genotype with the model
+        blue = genotype + trial + e
+    weighted by plot count, again with genotypes absorbed.
+    Returns: germplasmName | value
+    """
+
+    g_codes, g_levels = blues["germplasmName"].factorize(sort=True)
+    t_codes, t_levels = blues[trial_col].factorize(sort=True)
+
+    drop = np.zeros(len(t_levels), dtype=bool)
+    drop[0] = True
+    T = _indicator(t_codes, len(t_levels), drop)
+
+    w = blues["n_plots"].to_numpy(dtype=float)
+    y = blues["blue"].to_numpy(dtype=float)
+
+    n_g = len(g_levels)
+    g, c = _solve_absorbed(g_codes, n_g, T, y, w)
+
+    value = g + c.sum() / len(t_levels)
+
+    return pd.DataFrame({"germplasmName": g_levels, "value": value})
+
+
+def adjusted_means(pheno, n_jobs=None, trial_col="studyName"):
+    """
+    Plot-level phenotypes → one adjusted mean per genotype
+    (stage 1 per-trial BLUEs, then stage 2 across trials).
+    """
+    blues = compute_trial_blues(pheno, n_jobs=n_jobs, trial_col=trial_col)
+    return combine_trial_blues(blues, trial_col=trial_col)
+
+
+# ============================================================
+# Script entry point
+# ============================================================
+
+if __name__ == "__main__":
+    print("\n=== Running blues.py as a script ===")
+
+    # Resolve repo root
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    input_path = os.path.join(ROOT, "data", "processed", "preprocessed_final.csv")
+    output_path = os.path.join(ROOT, "data", "processed", "trial_blues.csv")
+
+    pheno = pd.read_csv(input_path)
+    blues = compute_trial_blues(pheno)
+
+    print(f"\nWriting per-trial BLUEs to: {output_path}")
+    blues.to_csv(output_path, index=False)
+
+    print(f"\n✓ Done. Final shape: {blues.shape}\n")
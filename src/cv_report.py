@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+cv_report.py
+
+Reporting for cross-validation results at scale (repeated CV across
+traits, λ grids, kernels, ...).
+Includes:
+  - a columnar results store: one directory per run, one .npy per
+    column (memory-mapped on load) plus the run's settings in run.json
+  - metrics (r, RMSE, slope, n) for any grouping from per-group
+    sufficient statistics, in a single groupby pass
+  - cached summary tables (keyed on the store contents)
+  - headless hexbin / bar-chart rendering (Agg backend, no plt.show)
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from artifact_cache import ArtifactCache
+
+
+# ============================================================
+# Columnar results store
+# ============================================================
+
+def write_cv_run(results, store_dir, **run_info):
+    """
+    Add one CV run (germplasmName | value | pred | fold [| studyName ...])
+    to the store. run_info (model_type, kernel, trait, lambda, ...) becomes
+    constant columns on load. The run id is a hash of the settings and
+    rows, so re-writing the same run replaces it. Returns the run id.
+    """
+
+    h = hashlib.sha256(json.dumps(run_info, sort_keys=True, default=str).encode())
+    h.update(pd.util.hash_pandas_object(results, index=False).to_numpy().tobytes())
+    run_id = h.hexdigest()[:16]
+
+    run_dir = os.path.join(store_dir, run_id)
+    os.makedirs(run_dir, exist_ok=True)
+
+    for col in results.columns:
+        values = results[col].to_numpy()
+        if values.dtype == object:
+            values = values.astype(str)
+        np.save(os.path.join(run_dir, f"col.{col}.npy"), values)
+
+    with open(os.path.join(run_dir, "run.json"), "w") as f:
+        json.dump(
+            {"run_id": run_id, "columns": list(map(str, results.columns)), "info": run_info},
+            f, default=str,
+        )
+
+    print(f"✓ Stored CV run {run_id} ({len(results)} rows) in {store_dir}")
+
+    return run_id
+
+
+def load_cv_runs(store_dir, columns=None):
+    """
+    Load every run in the store as one DataFrame, with a "run" column
+    and the run settings as categorical columns. `columns` restricts
+    which result columns are read.
+    """
+
+    frames, infos = [], []
+    for run_id in sorted(os.listdir(store_dir)):
+        meta_path = os.path.join(store_dir, run_id, "run.json")
+        if not os.path.exists(meta_path):
+            continue
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+        cols = meta["columns"] if columns is None else [c for c in columns if c in meta["columns"]]
+        df = pd.DataFrame({
+            c: np.load(os.path.join(store_dir, run_id, f"col.{c}.npy"), mmap_mode="r")
+            for c in cols
+        })
+        frames.append(df)
+        infos.append({"run": run_id, **{k: str(v) for k, v in meta["info"].items()}})
+
+    if not frames:
+        raise ValueError(f"No CV runs found in {store_dir}")
+
+    out = pd.concat(frames, ignore_index=True)
+
+    # Run settings: one categorical code per run, repeated over its rows
+    infos = pd.DataFrame(infos).fillna("")
+    lengths = [len(df) for df in frames]
+    for col in infos.columns:
+        codes, levels = pd.factorize(infos[col], sort=True)
+        out[col] = pd.Categorical.from_codes(np.repeat(codes, lengths), levels)
+
+    return out
+
+
+# ============================================================
+# Metrics from sufficient statistics
+# ============================================================
+
+def cv_metrics(results, by=("fold",)):
+    """
+    Accuracy metrics per group, from the sums
+        n, Σv, Σp, Σv², Σp², Σvp     (v = observed value, p = prediction)
+    collected in one groupby:
+        r     = cov(v, p) / sqrt(var v · var p)
+        rmse  = sqrt(Σ(p - v)² / n)
+        slope = cov(v, p) / var p      (regression of observed on predicted)
+    by=() gives a single overall row. Returns: by... | n | r | rmse | slope
+    """
+
+    by = list(by)
+    v = results["value"].to_numpy(dtype=float)
+    p = results["pred"].to_numpy(dtype=float)
+    ok = ~(np.isnan(v) | np.isnan(p))
+
+    stats = pd.DataFrame({
+        "n": ok.astype(float),
+        "sv": np.where(ok, v, 0.0),
+        "sp": np.where(ok, p, 0.0),
+        "svv": np.where(ok, v * v, 0.0),
+        "spp": np.where(ok, p * p, 0.0),
+        "svp": np.where(ok, v * p, 0.0),
+    })
+
+    if by:
+        for col in by:
+            stats[col] = results[col].array
+        sums = stats.groupby(by, observed=True, sort=True).sum()
+    else:
+        sums = stats.sum().to_frame().T
+
+    n = sums["n"]
+    cov = sums["svp"] - sums["sv"] * sums["sp"] / n
+    var_v = sums["svv"] - sums["sv"] ** 2 / n
+    var_p = sums["spp"] - sums["sp"] ** 2 / n
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = pd.DataFrame({
+            "n": n.astype(int),
+            "r": cov / np.sqrt(var_v * var_p),
+            "rmse": np.sqrt((sums["spp"] - 2.0 * sums["svp"] + sums["svv"]) / n),
+            "slope": cov / var_p,
+        })
+
+    return out.reset_index() if by else out.reset_index(drop=True)
+
+
+def summarize_cv_store(store_dir, by=("run", "fold"), cache_dir=None):
+    """
+    cv_metrics over the whole store, cached in cache_dir (ArtifactCache)
+    so summaries are only recomputed when the store changes.
+    """
+
+    def compute():
+        needed = ["value", "pred"] + [c for c in by if c != "run"]
+        return {"summary": cv_metrics(load_cv_runs(store_dir, columns=needed), by)}
+
+    if cache_dir is None:
+        return compute()["summary"]
+
+    cache = ArtifactCache(cache_dir)
+    summary = cache.get_or_compute(
+        "cv_summary", compute, inputs=[store_dir], params={"by": list(by)}
+    )["summary"]
+
+    return pd.DataFrame({c: np.asarray(summary[c]) for c in summary.columns})
+
+
+# ============================================================
+# Headless plots
+# ============================================================
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def plot_cv_density(results, path, gridsize=80, title=None):
+    """Observed vs predicted as a hexbin density (any number of rows)."""
+
+    plt = _pyplot()
+    v = results["value"].to_numpy(dtype=float)
+    p = results["pred"].to_numpy(dtype=float)
+    ok = ~(np.isnan(v) | np.isnan(p))
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    hb = ax.hexbin(v[ok], p[ok], gridsize=gridsize, bins="log", mincnt=1, cmap="viridis")
+    fig.colorbar(hb, ax=ax, label="count (log)")
+
+    lo = min(v[ok].min(), p[ok].min())
+    hi = max(v[ok].max(), p[ok].max())
+    ax.plot([lo, hi], [lo, hi], "k--", linewidth=1)
+
+    ax.set_xlabel("Observed")
+    ax.set_ylabel("Predicted")
+    if title:
+        ax.set_title(title)
+
+    fig.tight_layout()
+    fig.savefig(path, dpi=300)
+    plt.close(fig)
+
+    print(f"✓ Saved {path}")
+
+
+def plot_metric_bars(summary, path, metric="r", by="fold", title=None):
+    """Bar chart of one metric from cv_metrics, one bar per `by` group."""
+
+    plt = _pyplot()
+    table = summary.groupby(by, observed=True)[metric].mean()
+
+    fig, ax = plt.subplots(figsize=(max(6, 0.3 * len(table)), 4))
+    table.plot(kind="bar", color="skyblue", edgecolor="black", ax=ax)
+    ax.set_ylabel(metric)
+    ax.set_xlabel(by)
+    if title:
+        ax.set_title(title)
+
+    fig.tight_layout()
+    fig.savefig(path, dpi=300)
+    plt.close(fig)
+
+    print(f"✓ Saved {path}")
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+env_kernel.py
+
+Environment similarity kernel between trials, built from study metadata
+(phenotype_utils.extract_environment_covariates / t3_io.get_study_metadata).
+Includes:
+  - covariate → feature conversion (year, planting/harvest day, season
+    length, plot geometry, location and design as categories)
+  - standardized Gaussian kernel over numeric + categorical distances
+  - on-disk cache keyed by a hash of the covariates
+  - incremental updates: only rows/columns for new studies are computed
+
+Scaling parameters and bandwidth are frozen at the first full build, so
+existing kernel entries stay valid when studies are added.
+"""
+
+import glob
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+
+NUMERIC_FEATURES = [
+    "year",
+    "planting_doy",
+    "harvest_doy",
+    "season_days",
+    "plotWidth",
+    "plotLength",
+    "plot_area",
+    "fieldSize",
+]
+
+CATEGORICAL_FEATURES = ["location", "designType"]
+
+# Trial metadata columns kept in preprocessed_final.csv → covariate names
+PHENO_COVARIATES = {
+    "studyName": "studyName",
+    "studyYear": "year",
+    "locationName": "location",
+    "studydesign": "designType",
+    "plantingdate": "plantingDate",
+    "harvestdate": "harvestDate",
+}
+
+
+# ============================================================
+# Covariates → features
+# ============================================================
+
+def environment_features(cov_df):
+    """
+    Convert raw trial covariates into numeric and categorical features.
+    Missing or unparseable values become NaN (numeric) or "" (categorical).
+    """
+
+    def col(name):
+        if name in cov_df.columns:
+            return cov_df[name]
+        return pd.Series(np.nan, index=cov_df.index)
+
+    planting = pd.to_datetime(col("plantingDate"), errors="coerce", format="mixed")
+    harvest = pd.to_datetime(col("harvestDate"), errors="coerce", format="mixed")
+
+    width = pd.to_numeric(col("plotWidth"), errors="coerce")
+    length = pd.to_numeric(col("plotLength"), errors="coerce")
+
+    numeric = pd.DataFrame({
+        "year": pd.to_numeric(col("year"), errors="coerce"),
+        "planting_doy": planting.dt.dayofyear,
+        "harvest_doy": harvest.dt.dayofyear,
+        "season_days": (harvest - planting).dt.days,
+        "plotWidth": width,
+        "plotLength": length,
+        "plot_area": width * length,
+        "fieldSize": pd.to_numeric(col("fieldSize"), errors="coerce"),
+    }, index=cov_df.index)[NUMERIC_FEATURES].astype(float)
+
+    categorical = pd.DataFrame({
+        c: col(c).fillna("").astype(str) for c in CATEGORICAL_FEATURES
+    }, index=cov_df.index)
+
+    return numeric, categorical
+
+
+def trial_covariates(pheno):
+    """
+    One covariate row per trial from the metadata columns of a plot-level
+    phenotype table (see PHENO_COVARIATES), keyed by studyName.
+    """
+    cols = [c for c in PHENO_COVARIATES if c in pheno.columns]
+    return (
+        pheno[cols]
+        .dropna(subset=["studyName"])
+        .drop_duplicates(subset="studyName")
+        .rename(columns=PHENO_COVARIATES)
+        .reset_index(drop=True)
+    )
+
+
+def _row_hashes(cov_df, id_col):
+    """Stable per-study hashes of the covariate rows."""
+    cols = sorted(cov_df.columns)
+    rows = cov_df[cols].astype(object).fillna("").astype(str).agg("\x1f".join, axis=1)
+    return np.array([
+        hashlib.sha1(f"{sid}\x1e{row}".encode()).hexdigest()
+        for sid, row in zip(cov_df[id_col].astype(str), rows)
+    ])
+
+
+def _covariate_hash(row_hashes):
+    return hashlib.sha1("".join(sorted(row_hashes)).encode()).hexdigest()[:16]
+
+
+# ============================================================
+# Kernel computation
+# ============================================================
+
+def _sq_distances(Za, Ca, Zb, Cb):
+    """
+    Squared distances between two sets of trials: Euclidean over the
+    standardized numeric features plus one per mismatching category.
+    """
+    d2 = (
+        (Za ** 2).sum(axis=1)[:, None]
+        + (Zb ** 2).sum(axis=1)[None, :]
+        - 2.0 * Za @ Zb.T
+    )
+    for j in range(Ca.shape[1]):
+        d2 += Ca[:, j][:, None] != Cb[:, j][None, :]
+    return np.maximum(d2, 0.0)
+
+
+def _standardize(numeric, mean, sd):
+    """Standardize with frozen parameters; missing values → 0 (the mean)."""
+    Z = (numeric.to_numpy(dtype=float) - mean) / sd
+    Z[np.isnan(Z)] = 0.0
+    return Z
+
+
+def _full_build(numeric, categorical):
+    mean = numeric.mean().fillna(0.0).to_numpy()
+    sd = numeric.std(ddof=0).to_numpy(copy=True)
+    sd[~(sd > 0)] = 1.0
+
+    Z = _standardize(numeric, mean, sd)
+    C = categorical.to_numpy(dtype=str)
+    D2 = _sq_distances(Z, C, Z, C)
+
+    # Median heuristic for the bandwidth
+    off = D2[~np.eye(len(D2), dtype=bool)]
+    bandwidth = float(np.median(off)) if off.size and np.median(off) > 0 else 1.0
+
+    return Z, C, mean, sd, bandwidth, np.exp(-D2 / bandwidth)
+
+
+# ============================================================
+# Cached builder (orchestrator)
+# ============================================================
+
+def build_env_kernel(cov_df, cache_dir=None, id_col="studyDbId"):
+    """
+    Build (or load) the environment kernel K between trials:
+        K_ij = exp(-d²_ij / h)
+    with d² over standardized covariates and h the median squared distance.
+
+    If cache_dir is given:
+      - an exact hit on the covariate hash is loaded from disk
+      - if a cached kernel covers a subset of the studies (with unchanged
+        covariates), only the new rows/columns are computed
+      - otherwise the kernel is rebuilt and cached
+    Returns: K, study_ids
+    """
+
+    cov_df = cov_df.drop_duplicates(subset=id_col).reset_index(drop=True)
+    study_ids = np.asarray(cov_df[id_col].astype(str), dtype=str)
+    row_hashes = _row_hashes(cov_df, id_col)
+    key = _covariate_hash(row_hashes)
+
+    numeric, categorical = environment_features(cov_df)
+
+    if cache_dir is None:
+        K = _full_build(numeric, categorical)[-1]
+        return K, study_ids.tolist()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"env_kernel_{key}.npz")
+
+    if os.path.exists(path):
+        with np.load(path) as f:
+            order = pd.Index(f["study_ids"]).get_indexer(study_ids)
+            K = f["K"][np.ix_(order, order)]
+        print(f"✓ Loaded cached environment kernel: {path}")
+        return K, study_ids.tolist()
+
+    base = _find_base_cache(cache_dir, row_hashes)
+
+    if base is None:
+        Z, C, mean, sd, bandwidth, K = _full_build(numeric, categorical)
+        print(f"✓ Built environment kernel for {len(study_ids)} trials")
+
+    else:
+        # Incremental: reuse cached block, compute only new rows/columns
+        old_pos = pd.Index(base["row_hashes"]).get_indexer(row_hashes)
+        is_old = old_pos >= 0
+        mean, sd, bandwidth = base["mean"], base["sd"], float(base["bandwidth"])
+
+        Z = _standardize(numeric, mean, sd)
+        C = categorical.to_numpy(dtype=str)
+
+        K = np.empty((len(study_ids), len(study_ids)))
+        K[np.ix_(is_old, is_old)] = base["K"][np.ix_(old_pos[is_old], old_pos[is_old])]
+
+        new = ~is_old
+        K_new = np.exp(-_sq_distances(Z[new], C[new], Z, C) / bandwidth)
+        K[new, :] = K_new
+        K[:, new] = K_new.T
+
+        print(f"✓ Extended cached environment kernel with {int(new.sum())} new trials")
+
+    np.savez(
+        path,
+        K=K,
+        study_ids=study_ids,
+        row_hashes=row_hashes,
+        mean=mean,
+        sd=sd,
+        bandwidth=bandwidth,
+    )
+
+    return K, study_ids.tolist()
+
+
+def _find_base_cache(cache_dir, row_hashes):
+    """
+    Largest cached kernel whose studies are all present (unchanged)
+    in the current covariates, or None.
+    """
+    current = set(row_hashes)
+    best = None
+
+    for path in glob.glob(os.path.join(cache_dir, "env_kernel_*.npz")):
+        with np.load(path) as f:
+            cached = f["row_hashes"]
+            if set(cached) <= current and (best is None or len(cached) > len(best["row_hashes"])):
+                best = {k: f[k] for k in ["K", "row_hashes", "mean", "sd", "bandwidth"]}
+
+    return best
+
+
+# ============================================================
+# Script entry point
+# ============================================================
+
+if __name__ == "__main__":
+    print("\n=== Running env_kernel.py as a script ===")
+
+    # Resolve repo root
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    pheno_path = os.path.join(ROOT, "data", "processed", "preprocessed_final.csv")
+    cache_dir = os.path.join(ROOT, "data", "cache", "env_kernel")
+
+    pheno = pd.read_csv(pheno_path, usecols=lambda c: c in PHENO_COVARIATES)
+    K, trials = build_env_kernel(trial_covariates(pheno), cache_dir=cache_dir, id_col="studyName")
+
+    print(f"\n✓ Done. Environment kernel for {len(trials)} trials in {cache_dir}\n")
@@ -1,5 +1,7 @@
 # src/genotype_utils.py
 
+import os
+import numpy as np
 import pandas as pd
 
 def load_genotype_matrix(path):
@@ -13,25 +15,36 @@ def load_genotype_matrix(path):
     return pd.read_csv(path)
 
 
-def merge_pheno_geno(pheno_df, geno_df):
-    """
-    Merge phenotypes and genotypes on accession/germplasmName.
-    Adjust the join key as needed for your dataset.
-    """
+def _find_join_key(pheno_df, geno_columns):
+    """Return the first common accession column name, or raise."""
 
     # Try common accession column names
     possible_keys = ["germplasmName", "accession", "GID", "genotype"]
 
-    join_key = None
     for key in possible_keys:
-        if key in pheno_df.columns and key in geno_df.columns:
-            join_key = key
-            break
+        if key in pheno_df.columns and key in geno_columns:
+            return key
+
+    raise ValueError(
+        "Could not find a shared accession column between phenotype and genotype data."
+    )
+
+
+def merge_pheno_geno(pheno_df, geno_df, lazy=False):
+    """
+    Merge phenotypes and genotypes on accession/germplasmName.
+    Adjust the join key as needed for your dataset.
+
+    With lazy=True, no marker data is copied: returns a PhenoGenoView
+    holding the phenotype rows plus an integer row index into geno_df.
+    geno_df may then also be a genotype store (open_genotype_store) or
+    a list of GRM line names; those are keyed on germplasmName.
+    """
 
-    if join_key is None:
-        raise ValueError(
-            "Could not find a shared accession column between phenotype and genotype data."
-        )
+    if lazy:
+        return PhenoGenoView(pheno_df, geno_df)
+
+    join_key = _find_join_key(pheno_df, geno_df.columns)
 
     print(f"Merging on key: {join_key}")
 
@@ -42,3 +55,132 @@ def merge_pheno_geno(pheno_df, geno_df):
     )
 
     return merged
+
+
+class PhenoGenoView:
+    """
+    Lazy phenotype–genotype join.
+
+    Attributes:
+      pheno     : phenotype rows (unchanged, one per plot/observation)
+      join_key  : accession column used for the join
+      row_index : int array, row of each phenotype record in the genotype
+                  source (-1 = not genotyped)
+
+    Marker data is only gathered on request (gather / iter_blocks), so
+    memory does not grow with the number of markers × plots.
+    """
+
+    def __init__(self, pheno_df, geno):
+        self.pheno = pheno_df
+        self.geno = geno
+
+        if isinstance(geno, pd.DataFrame):
+            self.join_key = _find_join_key(pheno_df, geno.columns)
+            geno_names = geno[self.join_key]
+            self.markers = geno.columns.drop(self.join_key)
+        else:
+            self.join_key = _find_join_key(pheno_df, ["germplasmName"])
+            if isinstance(geno, dict):
+                geno_names = geno["lines"]
+                self.markers = geno["markers"]
+            else:
+                geno_names = geno
+                self.markers = None
+
+        print(f"Indexing join on key: {self.join_key}")
+
+        # One hash lookup per phenotype row: O(n_rows)
+        self.row_index = pd.Index(geno_names).get_indexer(pheno_df[self.join_key])
+
+    def __len__(self):
+        return len(self.pheno)
+
+    @property
+    def genotyped(self):
+        """Boolean mask of phenotype rows with a genotype record."""
+        return self.row_index >= 0
+
+    def gather(self, rows=None, markers=None):
+        """
+        Return dosages (len(rows) × markers) for the given phenotype rows.
+        Each genotype row is read once even if repeated across plots;
+        rows without genotypes and unknown marker names come back as NaN.
+        """
+
+        if self.markers is None:
+            raise ValueError("Genotype source has no marker data (GRM line index only).")
+
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows)
+        if markers is None:
+            col_idx = np.arange(len(self.markers))
+        else:
+            col_idx = self.markers.get_indexer(markers)
+        col_found = col_idx >= 0
+        col_idx = col_idx[col_found]
+
+        geno_rows = self.row_index[rows]
+        found = geno_rows >= 0
+        uniq, inverse = np.unique(geno_rows[found], return_inverse=True)
+
+        if isinstance(self.geno, pd.DataFrame):
+            col_pos = self.geno.columns.get_indexer(self.markers[col_idx])
+            block = self.geno.iloc[uniq, col_pos].to_numpy(dtype=float)
+        else:
+            block = np.asarray(self.geno["dosage"][np.ix_(uniq, col_idx)], dtype=float)
+
+        out = np.full((len(rows), len(col_found)), np.nan)
+        out[np.ix_(found, col_found)] = block[inverse]
+        return out
+
+    def iter_blocks(self, block_size=10000, markers=None):
+        """Yield (phenotype rows, dosage block) pairs of block_size rows."""
+        for start in range(0, len(self), block_size):
+            rows = np.arange(start, min(start + block_size, len(self)))
+            yield self.pheno.iloc[rows], self.gather(rows, markers)
+
+
+def write_genotype_store(geno_df, store_dir, dtype="float32"):
+    """
+    Write a wide genotype DataFrame to an on-disk genotype store:
+        dosage.npy   : lines × markers dosage matrix (NaN = missing)
+        lines.txt    : accession names, one per row of dosage.npy
+        markers.txt  : marker names, one per column of dosage.npy
+    """
+    os.makedirs(store_dir, exist_ok=True)
+
+    markers = geno_df.columns.drop("germplasmName")
+    np.save(
+        os.path.join(store_dir, "dosage.npy"),
+        geno_df[markers].to_numpy(dtype=dtype),
+    )
+
+    with open(os.path.join(store_dir, "lines.txt"), "w") as f:
+        f.write("\n".join(geno_df["germplasmName"].astype(str)) + "\n")
+    with open(os.path.join(store_dir, "markers.txt"), "w") as f:
+        f.write("\n".join(markers.astype(str)) + "\n")
+
+    print(f"✓ Wrote genotype store to {store_dir} ({len(geno_df)} × {len(markers)})")
+
+
+def open_genotype_store(store_dir, mmap_mode="r"):
+    """
+    Open a genotype store written by write_genotype_store.
+    The dosage matrix is memory-mapped; rows are read only when sliced.
+    Returns a dict with keys: lines, markers, dosage.
+    """
+    with open(os.path.join(store_dir, "lines.txt")) as f:
+        lines = f.read().splitlines()
+    with open(os.path.join(store_dir, "markers.txt")) as f:
+        markers = pd.Index(f.read().splitlines())
+
+    dosage = np.load(os.path.join(store_dir, "dosage.npy"), mmap_mode=mmap_mode)
+
+    return {"lines": lines, "markers": markers, "dosage": dosage}
+
+
+def genotype_store_to_frame(store):
+    """Materialize an opened genotype store as a wide genotype DataFrame."""
+    geno = pd.DataFrame(np.asarray(store["dosage"], dtype=float), columns=store["markers"])
+    geno.insert(0, "germplasmName", store["lines"])
+    return geno
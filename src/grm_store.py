@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+grm_store.py
+
+On-disk GRM format shared read-only across processes.
+Layout of a GRM directory:
+    grm.npy              : n × n relationship matrix (memory-mapped on open)
+    accessions.npy       : accession name of each row/column
+    accession_order.npy  : argsort of accessions (sorted name index)
+
+Name lookups are vectorized binary searches on the sorted index, and a
+SharedGRM pickles as its path, so worker processes re-open the same
+memory map instead of receiving a copy of the matrix.
+"""
+
+import os
+
+import numpy as np
+
+
+def grm_store_fields(G, lines):
+    """The grm_store layout as name → array (grm / accessions / accession_order)."""
+    lines = np.asarray(lines, dtype=str)
+    return {
+        "grm": np.asarray(G, dtype=float),
+        "accessions": lines,
+        "accession_order": np.argsort(lines, kind="stable"),
+    }
+
+
+def save_grm(G, lines, grm_dir):
+    """Write G and its accession index to grm_dir."""
+    os.makedirs(grm_dir, exist_ok=True)
+
+    fields = grm_store_fields(G, lines)
+    for name, values in fields.items():
+        np.save(os.path.join(grm_dir, f"{name}.npy"), values)
+
+    print(f"✓ Wrote GRM store to {grm_dir} ({len(fields['accessions'])} accessions)")
+
+
+def open_grm(grm_dir):
+    """Open a GRM directory read-only."""
+    return SharedGRM(grm_dir)
+
+
+class SharedGRM:
+    """
+    Read-only, memory-mapped GRM with a named accession index.
+
+    Supports G[...] indexing like an ndarray, plus name-based access:
+        G.indices(names)             → row positions (-1 = not present)
+        G.submatrix(rows, cols=None) → dense block for two name sets
+    """
+
+    def __init__(self, grm_dir):
+        self.grm_dir = grm_dir
+        self.matrix = np.load(os.path.join(grm_dir, "grm.npy"), mmap_mode="r")
+        self.lines = np.load(os.path.join(grm_dir, "accessions.npy"), mmap_mode="r")
+        self._order = np.load(os.path.join(grm_dir, "accession_order.npy"), mmap_mode="r")
+        self._sorted = self.lines[self._order]
+
+    # Pickle as a path: workers re-open the shared memory map
+    def __getstate__(self):
+        return {"grm_dir": self.grm_dir}
+
+    def __setstate__(self, state):
+        self.__init__(state["grm_dir"])
+
+    def __getitem__(self, key):
+        return self.matrix[key]
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    def diagonal(self):
+        return self.matrix.diagonal()
+
+    def indices(self, names):
+        """Row positions of `names` (vectorized), -1 where absent."""
+        names = np.asarray(names, dtype=str)
+        pos = np.searchsorted(self._sorted, names)
+        pos = np.minimum(pos, len(self._sorted) - 1)
+        found = self._sorted[pos] == names
+        return np.where(found, self._order[pos], -1)
+
+    def submatrix(self, rows, cols=None):
+        """
+        Dense G[rows, cols] for two sets of accession names
+        (cols defaults to rows). Raises KeyError on unknown names.
+        """
+        r = self.indices(rows)
+        c = r if cols is None else self.indices(cols)
+        if (r < 0).any() or (c < 0).any():
+            missing = np.concatenate([
+                np.asarray(rows, dtype=str)[r < 0],
+                np.asarray(rows if cols is None else cols, dtype=str)[c < 0],
+            ])
+            raise KeyError(f"Accessions not in GRM: {sorted(set(missing))[:10]}")
+        return self.matrix[np.ix_(r, c)]
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+imputation.py
+
+Fast kNN genotype imputation driven by the lines' own relationship structure.
+Includes:
+  - pairwise-complete IBS similarity from masked matrix products
+  - k-nearest-neighbour selection per line
+  - blocked, threaded neighbour-weighted imputation of missing calls
+  - writing imputed dosages to the genotype store
+
+Replaces per-marker mean imputation for panels with many ./. calls.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from genotype_utils import write_genotype_store
+
+
+# ============================================================
+# First-pass similarity (IBS over shared calls)
+# ============================================================
+
+def ibs_similarity(X, block_size=5000):
+    """
+    Pairwise-complete IBS similarity between lines (rows of X).
+
+    For dosages in {0, 1, 2} with NaN = missing:
+        IBS_ij = 1 - Σ_k |x_ik - x_jk| / (2 · n_ij)
+    summed over the n_ij markers called in both lines. Every term is a
+    matrix product over marker blocks, so no Python loop over pairs:
+        Σ |a - b| = Σ (a - b)² - 2 · (#0/2 + #2/0 opposite homozygotes)
+    Pairs with no shared calls get similarity 0.
+    """
+
+    n, m = X.shape
+
+    shared = np.zeros((n, n))
+    sq_diff = np.zeros((n, n))
+    opposite = np.zeros((n, n))
+
+    for start in range(0, m, block_size):
+        Xb = X[:, start:start + block_size]
+        M = (~np.isnan(Xb)).astype(float)
+        X0 = np.where(M > 0, Xb, 0.0)
+        X2 = X0 ** 2
+        H0 = M * (X0 == 0)
+        H2 = M * (X0 == 2)
+
+        shared += M @ M.T
+        cross = X2 @ M.T
+        sq_diff += cross + cross.T - 2.0 * (X0 @ X0.T)
+        hom = H0 @ H2.T
+        opposite += hom + hom.T
+
+    abs_diff = sq_diff - 2.0 * opposite
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        S = 1.0 - abs_diff / (2.0 * shared)
+    S[shared == 0] = 0.0
+
+    return S
+
+
+def nearest_neighbours(S, k):
+    """
+    Return (neighbours, weights): the k most similar other lines per row
+    of S and their (non-negative) similarities.
+    """
+
+    n = S.shape[0]
+    k = min(k, n - 1)
+
+    S = S.copy()
+    np.fill_diagonal(S, -np.inf)
+
+    nbrs = np.argpartition(-S, k - 1, axis=1)[:, :k]
+    weights = np.clip(np.take_along_axis(S, nbrs, axis=1), 0.0, None)
+
+    return nbrs, weights
+
+
+# ============================================================
+# Neighbour-weighted imputation
+# ============================================================
+
+def _impute_block(X, W, col_means):
+    """
+    Impute one marker block in place.
+    W is a sparse (lines × lines) neighbour-weight matrix, so the weighted
+    sums over neighbours are two sparse × dense products.
+    """
+
+    M = ~np.isnan(X)
+    X0 = np.where(M, X, 0.0)
+
+    num = W @ X0
+    den = W @ M.astype(float)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        est = num / den
+    est = np.where(den > 0, est, col_means)
+
+    X[~M] = est[~M]
+    return X
+
+
+def knn_impute(geno_df, k=10, block_size=2000, n_jobs=None):
+    """
+    Impute missing genotype calls from each line's k nearest neighbours.
+
+    1. First-pass IBS similarity over shared calls (ibs_similarity)
+    2. k nearest neighbours per line, weighted by similarity
+    3. missing call = weighted mean of the neighbours' observed calls,
+       falling back to the marker mean when no neighbour is called
+
+    Markers are processed in blocks of `block_size` across `n_jobs` threads.
+    Returns a wide genotype DataFrame with the same layout as geno_df.
+    """
+
+    markers = geno_df.columns.drop("germplasmName")
+    X = geno_df[markers].to_numpy(dtype=float, copy=True)
+    n, m = X.shape
+
+    missing_before = int(np.isnan(X).sum())
+    print(f"Imputing {missing_before} missing calls "
+          f"({missing_before / max(X.size, 1):.1%}) with k={k}")
+
+    S = ibs_similarity(X, block_size=block_size)
+    nbrs, weights = nearest_neighbours(S, k)
+
+    W = sparse.csr_matrix(
+        (weights.ravel(), (np.repeat(np.arange(n), nbrs.shape[1]), nbrs.ravel())),
+        shape=(n, n),
+    )
+
+    col_means = np.nanmean(X, axis=0)
+    col_means[np.isnan(col_means)] = 0.0
+
+    starts = range(0, m, block_size)
+
+    def run(start):
+        stop = start + block_size
+        X[:, start:stop] = _impute_block(X[:, start:stop], W, col_means[start:stop])
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        list(pool.map(run, starts))
+
+    imputed = pd.DataFrame(X, columns=markers)
+    imputed.insert(0, "germplasmName", geno_df["germplasmName"].to_numpy())
+
+    print(f"✓ Imputed genotype matrix: {imputed.shape}")
+
+    return imputed
+
+
+# ============================================================
+# Script entry point
+# ============================================================
+
+if __name__ == "__main__":
+    print("\n=== Running imputation.py as a script ===")
+
+    # Resolve repo root
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    input_path = os.path.join(ROOT, "data", "processed", "geno_merged_raw.csv")
+    store_dir = os.path.join(ROOT, "data", "processed", "geno_imputed")
+
+    print(f"Reading genotype matrix: {input_path}")
+    geno = pd.read_csv(input_path)
+
+    imputed = knn_impute(geno, k=10, block_size=2000)
+    write_genotype_store(imputed, store_dir)
+
+    print("\n✓ Done.\n")
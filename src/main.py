@@ -11,6 +11,12 @@ from models import (
     build_grm_from_geno,
 )
 from submission import write_submission_files
+from blues import adjusted_means
+from genotype_utils import open_genotype_store, genotype_store_to_frame
+from artifact_cache import ArtifactCache
+from grm_store import grm_store_fields, open_grm
+from cv_report import write_cv_run
+from env_kernel import PHENO_COVARIATES, build_env_kernel, trial_covariates
 
 
 # Challenge trials for Predictathon
@@ -26,6 +32,50 @@ FOCAL_TRIALS = [
     "STP1_2025_MCG",
 ]
 
+# Size budget for data/cache (least-recently-used artifacts are evicted)
+CACHE_MAX_BYTES = 8 * 2**30
+
+# Worker processes for CV folds (they share the memory-mapped GRM)
+CV_JOBS = min(5, os.cpu_count() or 1)
+
+
+def _dosage_artifact(geno_source):
+    """Genotype store fields (dosage / lines / markers) for the cache."""
+    if os.path.isdir(geno_source):
+        store = open_genotype_store(geno_source)
+    else:
+        geno = pd.read_csv(geno_source)
+        store = {
+            "dosage": geno.drop(columns=["germplasmName"]).to_numpy(dtype="float32"),
+            "lines": geno["germplasmName"].astype(str).tolist(),
+            "markers": geno.columns.drop("germplasmName"),
+        }
+    return {
+        "dosage": np.asarray(store["dosage"]),
+        "lines": np.asarray(store["lines"], dtype=str),
+        "markers": np.asarray(store["markers"], dtype=str),
+    }
+
+
+def _grm_artifact(geno):
+    """GRM in grm_store layout, plus its QC / centering parameters."""
+    G, geno_lines, params = build_grm_from_geno(geno, return_params=True)
+    return {
+        **grm_store_fields(G, geno_lines),
+        "markers": np.asarray(params["markers"], dtype=str),
+        "col_means": params["col_means"],
+        "n_markers": params["n_markers"],
+    }
+
+
+def _model_from_artifact(artifact, G, geno_lines):
+    """Re-attach the shared GRM / line list that are not stored per model."""
+    model = dict(artifact)
+    if "u" in model and model.get("model_type") != "lowrank":
+        model["G_full"] = G
+    model["geno_lines"] = geno_lines
+    return model
+
 
 def main():
 
@@ -38,28 +88,53 @@ def main():
 
     pheno_path = os.path.join(data_dir, "preprocessed_final.csv")
     geno_path = os.path.join(data_dir, "geno_merged_raw.csv")
+    imputed_store = os.path.join(data_dir, "geno_imputed")
+
+    cache = ArtifactCache(os.path.join(ROOT, "data", "cache"), max_bytes=CACHE_MAX_BYTES)
 
     # --------------------------------------------------------------
     # Step 1: Load processed data
     # --------------------------------------------------------------
     print("\n=== Loading processed data ===")
 
-    pheno = pd.read_csv(pheno_path)
-    geno = pd.read_csv(geno_path)
+    # Prefer kNN-imputed dosages (imputation.py) when the store exists
+    if os.path.isdir(imputed_store):
+        geno_source = imputed_store
+        print(f"✓ Using kNN-imputed genotype store: {imputed_store}")
+    else:
+        geno_source = geno_path
+
+    dosage = cache.get_or_compute(
+        "dosage", lambda: _dosage_artifact(geno_source), inputs=[geno_source]
+    )
+    geno = genotype_store_to_frame(dosage)
 
-    print(f"✓ Raw phenotype rows: {len(pheno)}")
     print(f"✓ Genotype matrix shape: {geno.shape}")
 
     # --------------------------------------------------------------
     # Step 1b: Convert long-format phenotype → modeling-ready format
+    #          (trial/replicate/block-adjusted BLUEs when plot
+    #           metadata is available, otherwise raw line means)
     # --------------------------------------------------------------
-    if {"germplasmName", "value"}.issubset(pheno.columns):
-        pheno = (
-            pheno.groupby("germplasmName")["value"]
-            .mean()
-            .reset_index()
-        )
-        print(f"✓ Collapsed phenotype to {len(pheno)} unique lines")
+    def collapse_pheno():
+        pheno = pd.read_csv(pheno_path)
+        print(f"✓ Raw phenotype rows: {len(pheno)}")
+
+        if {"germplasmName", "value", "studyName"}.issubset(pheno.columns):
+            pheno = adjusted_means(pheno)
+            print(f"✓ Adjusted phenotype to BLUEs for {len(pheno)} unique lines")
+
+        elif {"germplasmName", "value"}.issubset(pheno.columns):
+            pheno = (
+                pheno.groupby("germplasmName")["value"]
+                .mean()
+                .reset_index()
+            )
+            print(f"✓ Collapsed phenotype to {len(pheno)} unique lines")
+
+        return {"pheno": pheno}
+
+    pheno = cache.get_or_compute("pheno", collapse_pheno, inputs=[pheno_path])["pheno"]
 
     # --------------------------------------------------------------
     # Step 1c: Restrict phenotype to lines with genotypes
@@ -73,11 +148,34 @@ def main():
     if after == 0:
         raise ValueError("No phenotype lines overlap with genotype lines.")
 
+    # --------------------------------------------------------------
+    # Step 1d: Environment kernel between the phenotyped trials
+    #          (from the trial metadata columns; incrementally cached)
+    # --------------------------------------------------------------
+    env = None
+    pheno_columns = pd.read_csv(pheno_path, nrows=0).columns
+    if "studyName" in pheno_columns:
+        trial_meta = pd.read_csv(pheno_path, usecols=lambda c: c in PHENO_COVARIATES)
+        K_env, env_trials = build_env_kernel(
+            trial_covariates(trial_meta),
+            cache_dir=os.path.join(ROOT, "data", "cache", "env_kernel"),
+            id_col="studyName",
+        )
+        env = {"K": K_env, "trials": env_trials}
+        print(f"✓ Environment kernel: {len(env_trials)} trials")
+
     # --------------------------------------------------------------
     # Step 2: Build GRM
     # --------------------------------------------------------------
     print("\n=== Building genomic relationship matrix (GRM) ===")
-    G, geno_lines_ordered = build_grm_from_geno(geno)
+    grm_params = {"missing": "mean"}
+    cache.get_or_compute(
+        "grm", lambda: _grm_artifact(geno), inputs=[geno_source], params=grm_params
+    )
+    grm_key = cache.key("grm", inputs=[geno_source], params=grm_params)
+
+    # Memory-mapped, shared read-only with CV worker processes
+    G = open_grm(cache.path_for("grm", inputs=[geno_source], params=grm_params))
     print(f"✓ GRM shape: {G.shape}")
 
     # Diagnostic: GRM diagonal range
@@ -85,7 +183,6 @@ def main():
           float(G.diagonal().min()),
           float(G.diagonal().max()))
 
-    env = None
     MODEL_TYPE = "me_gblup"
 
     # --------------------------------------------------------------
@@ -102,14 +199,20 @@ def main():
     # --------------------------------------------------------------
     print("\n=== Running CV1 cross-validation ===")
 
-    cv_results = cross_validate_model(
-        train_pheno=pheno,
-        geno=geno,
-        env=env,
-        G=G,
-        model_type=MODEL_TYPE,
-        n_folds=5,
-    )
+    cv_results = cache.get_or_compute(
+        "cv1",
+        lambda: {"cv_results": cross_validate_model(
+            train_pheno=pheno,
+            geno=geno,
+            env=env,
+            G=G,
+            model_type=MODEL_TYPE,
+            n_folds=5,
+            n_jobs=CV_JOBS,
+        )},
+        inputs=[pheno, geno_source, grm_key],
+        params={"model_type": MODEL_TYPE, "n_folds": 5},
+    )["cv_results"]
 
     if {"value", "pred"}.issubset(cv_results.columns):
         corr = cv_results["value"].corr(cv_results["pred"])
@@ -121,18 +224,32 @@ def main():
     cv_results.to_csv(cv_out, index=False)
     print(f"✓ Saved CV1 results to {cv_out}")
 
+    # Columnar run store for cv_report / visualize_cv1.py
+    write_cv_run(
+        cv_results, os.path.join(output_root, "cv_runs"), model_type=MODEL_TYPE, n_folds=5
+    )
+
     # --------------------------------------------------------------
     # Step 5: Fit final model on all training data
     # --------------------------------------------------------------
     print("\n=== Fitting final model on all training data ===")
 
-    model = fit_model(
-        train_pheno=pheno,
-        geno=geno,
-        env=env,
-        G=G,
-        model_type=MODEL_TYPE,
+    model_artifact = cache.get_or_compute(
+        "model",
+        lambda: {
+            k: v for k, v in fit_model(
+                train_pheno=pheno,
+                geno=geno,
+                env=env,
+                G=G,
+                model_type=MODEL_TYPE,
+            ).items()
+            if k not in ("G_full", "geno_lines")
+        },
+        inputs=[pheno, geno_source, grm_key],
+        params={"model_type": MODEL_TYPE},
     )
+    model = _model_from_artifact(model_artifact, G, geno["germplasmName"].tolist())
 
     # --------------------------------------------------------------
     # Step 6: Predict for challenge trials
@@ -4,9 +4,20 @@ import numpy as np
 import glob
 import os
 
+from vcf_index import read_vcf_dosage
+from vcf_utils import vcf_marker_prefix
+
 # Path to your real genotype directory
 RAW_DIR = "/Users/emilybillow/Desktop/emilybillow_data/raw"
 
+# Optional targeted extract (None = everything): chromosome names or
+# (chrom, start, end) tuples, and accession names. Plain-text VCFs are
+# then read through the byte-offset index in vcf_index.py, decoding only
+# the requested regions and sample columns.
+# Both read paths code missing calls as NaN (imputed downstream).
+REGIONS = None
+SAMPLES = None
+
 # Detect ALL VCFs in that folder (both .vcf and .vcf.gz)
 vcf_paths = sorted(
     glob.glob(os.path.join(RAW_DIR, "*.vcf")) +
@@ -26,18 +37,26 @@ all_samples = set()
 # Step 1: read each VCF
 for vcf in vcf_paths:
     print(f"\nReading {vcf}")
-    callset = allel.read_vcf(vcf, fields=["samples", "calldata/GT", "variants/ID"])
-
-    samples = callset["samples"]
-    gt = allel.GenotypeArray(callset["calldata/GT"]).to_n_alt()
-    markers = callset["variants/ID"]
 
     # Prefix markers with filename to avoid collisions
-    prefix = os.path.basename(vcf).replace(".vcf", "").replace(".gz", "")
-    markers = [f"{prefix}_{m}" for m in markers]
+    prefix = vcf_marker_prefix(vcf)
+
+    if (REGIONS is not None or SAMPLES is not None) and not vcf.endswith(".gz"):
+        df = read_vcf_dosage(vcf, regions=REGIONS, samples=SAMPLES)
+        df.columns = ["germplasmName"] + [f"{prefix}_{m}" for m in df.columns[1:]]
+        samples = df["germplasmName"].tolist()
+    else:
+        callset = allel.read_vcf(vcf, fields=["samples", "calldata/GT", "variants/ID"])
+
+        samples = callset["samples"]
+        gt = allel.GenotypeArray(callset["calldata/GT"]).to_n_alt(fill=-1).astype(float)
+        gt[gt < 0] = np.nan
+        markers = callset["variants/ID"]
+
+        markers = [f"{prefix}_{m}" for m in markers]
 
-    df = pd.DataFrame(gt.T, columns=markers)
-    df.insert(0, "germplasmName", samples)
+        df = pd.DataFrame(gt.T, columns=markers)
+        df.insert(0, "germplasmName", samples)
 
     all_geno.append(df)
     all_samples.update(samples)
@@ -1,26 +1,33 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import numpy as np
 import pandas as pd
+from scipy.sparse.linalg import LinearOperator, cg, lsqr
 from sklearn.model_selection import KFold
+from sklearn.utils.extmath import randomized_svd
+
+from grm_store import SharedGRM
 
 
 # ------------------------------------------------------------
 # 0. Build a stable VanRaden-like GRM from genotype matrix
 # ------------------------------------------------------------
 
-def build_grm_from_geno(geno_df):
+def _centered_marker_matrix(geno_df):
     """
-    Build a genomic relationship matrix G from a wide genotype DataFrame.
-
-    Assumes:
-      - geno_df has a 'germplasmName' column
-      - all other columns are numeric marker genotypes (0/1/2 or dosages)
+    Mean-impute, filter and center the marker matrix of a wide genotype DataFrame.
+    Returns:
+        Z          : centered marker matrix (lines × polymorphic markers)
+        geno_lines : line names in row order
+        col_means  : per-marker means over all markers (before filtering)
+        keep       : boolean mask of polymorphic markers
     """
 
     # Keep line order consistent
     geno_lines = geno_df["germplasmName"].tolist()
 
     # Extract marker matrix
-    X = geno_df.drop(columns=["germplasmName"]).to_numpy(dtype=float)
+    X = geno_df.drop(columns=["germplasmName"]).to_numpy(dtype=float, copy=True)
 
     # Simple missing-data handling: impute column means
     col_means = np.nanmean(X, axis=0)
@@ -37,26 +44,404 @@ def build_grm_from_geno(geno_df):
         raise ValueError("All markers are monomorphic after filtering.")
 
     # Center markers by column mean
-    X_centered = X - X.mean(axis=0, keepdims=True)
+    Z = X - X.mean(axis=0, keepdims=True)
+
+    return Z, geno_lines, col_means, keep
+
+
+def _tiled_crossprod(A, block_size=2048, n_jobs=None):
+    """
+    Compute A @ A.T in (block_size × block_size) tiles across a thread pool.
+    Only upper-triangle tiles are computed; the lower half is mirrored.
+    """
+
+    n = A.shape[0]
+    out = np.empty((n, n), dtype=np.result_type(A, np.float64))
+    starts = range(0, n, block_size)
+    tiles = [(i, j) for i in starts for j in starts if j >= i]
+
+    def run(tile):
+        i, j = tile
+        block = A[i:i + block_size] @ A[j:j + block_size].T
+        out[i:i + block_size, j:j + block_size] = block
+        if i != j:
+            out[j:j + block_size, i:i + block_size] = block.T
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        list(pool.map(run, tiles))
+
+    return out
+
+
+def build_grm_from_geno(geno_df, return_params=False, missing="mean",
+                        block_size=2048, n_jobs=None, markers=None):
+    """
+    Build a genomic relationship matrix G from a wide genotype DataFrame.
+
+    Assumes:
+      - geno_df has a 'germplasmName' column
+      - all other columns are numeric marker genotypes (0/1/2 or dosages)
+
+    missing:
+      - "mean"     : mean-impute, then G = Z Z' / m
+      - "pairwise" : pairwise-complete G over markers called in both lines,
+                     G_ij = (Z Z')_ij / (M M')_ij with Z zero at missing
+                     calls and M the observed-call mask (two tiled products)
+
+    With return_params=True also returns the centering parameters
+    (kept marker names and their means) needed to score new lines
+    against this G without rebuilding it (see score_new_accessions).
+
+    markers restricts G to a marker subset, e.g. the output of
+    marker_scan.select_markers.
+    """
+
+    if markers is not None:
+        geno_df = geno_df[["germplasmName", *markers]]
+
+    X_centered, geno_lines, col_means, keep = _centered_marker_matrix(geno_df)
 
     # Number of markers
     m = X_centered.shape[1]
 
-    # VanRaden-like GRM: G = X_centered X_centered' / m
-    G = (X_centered @ X_centered.T) / m
+    if missing == "mean":
+        # VanRaden-like GRM: G = X_centered X_centered' / m
+        G = _tiled_crossprod(X_centered, block_size, n_jobs) / m
+
+    elif missing == "pairwise":
+        M = geno_df.drop(columns=["germplasmName"]).notna().to_numpy()[:, keep]
+        M = M.astype(X_centered.dtype)
+        X_centered *= M
+
+        num = _tiled_crossprod(X_centered, block_size, n_jobs)
+        shared = _tiled_crossprod(M, block_size, n_jobs)
+        G = np.divide(num, shared, out=np.zeros_like(num), where=shared > 0)
+
+    else:
+        raise ValueError(f"Unknown missing-data mode: {missing}")
+
+    if return_params:
+        params = {
+            "markers": geno_df.columns.drop("germplasmName")[keep],
+            "col_means": col_means[keep],
+            "n_markers": m,
+        }
+        return G, geno_lines, params
 
     return G, geno_lines
 
 
+def save_grm_params(params, path):
+    """Persist GRM centering parameters (allele means + marker mask) to .npz."""
+    np.savez(
+        path,
+        markers=np.asarray(params["markers"], dtype=str),
+        col_means=params["col_means"],
+        n_markers=params["n_markers"],
+    )
+
+
+def load_grm_params(path):
+    """Load GRM centering parameters written by save_grm_params."""
+    with np.load(path) as f:
+        return {
+            "markers": pd.Index(f["markers"]),
+            "col_means": f["col_means"],
+            "n_markers": int(f["n_markers"]),
+        }
+
+
+# ------------------------------------------------------------
+# 0b. RR-BLUP marker effects (primal / dual ridge solver)
+# ------------------------------------------------------------
+
+# Above this size of the smaller normal-equation system, "auto" switches
+# from a direct O(k³) solve to matrix-free CG
+DIRECT_SOLVE_MAX = 20000
+
+def solve_marker_effects(Z, y, lambda_, solver="auto", tol=1e-8, max_iter=None):
+    """
+    Solve the RR-BLUP ridge problem for marker effects β:
+        primal: (Z'Z + λI) β = Z'y            (m × m system)
+        dual:   β = Z' (ZZ' + λI)^(-1) y      (n × n system)
+
+    solver:
+      - "auto"   : primal when m <= n, dual otherwise; "cg" once the
+                   smaller system exceeds DIRECT_SOLVE_MAX unknowns
+      - "primal" / "dual" : force a direct solve in that form
+      - "cg"     : conjugate gradients on the smaller form, using
+                   matrix-free Z / Z' products (never forms Z'Z or ZZ')
+      - "lsqr"   : damped least squares on Z directly (damp = sqrt(λ))
+    """
+
+    n, m = Z.shape
+
+    if solver == "auto":
+        if min(n, m) > DIRECT_SOLVE_MAX:
+            solver = "cg"
+        else:
+            solver = "primal" if m <= n else "dual"
+
+    if solver == "primal":
+        A = Z.T @ Z
+        A[np.diag_indices_from(A)] += lambda_
+        try:
+            return np.linalg.solve(A, Z.T @ y)
+        except np.linalg.LinAlgError:
+            return np.linalg.lstsq(A, Z.T @ y, rcond=None)[0]
+
+    if solver == "dual":
+        A = Z @ Z.T
+        A[np.diag_indices_from(A)] += lambda_
+        try:
+            alpha = np.linalg.solve(A, y)
+        except np.linalg.LinAlgError:
+            alpha = np.linalg.lstsq(A, y, rcond=None)[0]
+        return Z.T @ alpha
+
+    if solver == "cg":
+        if m <= n:
+            op = LinearOperator(
+                (m, m), matvec=lambda v: Z.T @ (Z @ v) + lambda_ * v, dtype=float
+            )
+            beta, info = cg(op, Z.T @ y, rtol=tol, maxiter=max_iter)
+        else:
+            op = LinearOperator(
+                (n, n), matvec=lambda v: Z @ (Z.T @ v) + lambda_ * v, dtype=float
+            )
+            alpha, info = cg(op, y, rtol=tol, maxiter=max_iter)
+            beta = Z.T @ alpha
+        if info > 0:
+            print(f"Warning: CG did not converge after {info} iterations")
+        return beta
+
+    if solver == "lsqr":
+        out = lsqr(Z, y, damp=np.sqrt(lambda_), atol=tol, btol=tol, iter_lim=max_iter)
+        return out[0]
+
+    raise ValueError(f"Unknown RR-BLUP solver: {solver}")
+
+
+def _fit_rrblup(train_lines, y, geno, lambda_, solver="auto"):
+    """
+    Fit RR-BLUP marker effects on the training lines.
+    Marker penalty is λ·m so results match GBLUP with G = ZZ'/m.
+    """
+
+    Z, geno_lines, col_means, keep = _centered_marker_matrix(geno)
+
+    idx = pd.Index(geno_lines).get_indexer(train_lines)
+    Z_train = Z[idx]
+
+    m = Z.shape[1]
+    beta = solve_marker_effects(Z_train, y, lambda_ * m, solver=solver)
+
+    markers = geno.columns.drop("germplasmName")[keep]
+
+    return beta, markers, col_means[keep]
+
+
+# ------------------------------------------------------------
+# 0c. Low-rank GRM approximation (randomized SVD / Nyström)
+# ------------------------------------------------------------
+
+def build_lowrank_grm(geno_df, rank=500, method="rsvd", n_iter=4, random_state=42):
+    """
+    Build a low-rank factor L (lines × rank) with G ≈ L L'.
+
+    method:
+      - "rsvd"    : randomized SVD of the centered marker matrix,
+                    Z ≈ U S V'  →  L = U S / sqrt(m)
+      - "nystrom" : `rank` random landmark lines,
+                    C = Z Z_l' / m, W = C_l  →  L = C W^(-1/2)
+
+    Neither method forms the n × n matrix, so memory is O(n·rank).
+    """
+
+    Z, geno_lines, _, _ = _centered_marker_matrix(geno_df)
+    n, m = Z.shape
+    rank = min(rank, n, m)
+
+    if method == "rsvd":
+        U, S, _ = randomized_svd(Z, rank, n_iter=n_iter, random_state=random_state)
+        L = U * (S / np.sqrt(m))
+
+    elif method == "nystrom":
+        rng = np.random.default_rng(random_state)
+        landmarks = np.sort(rng.choice(n, size=rank, replace=False))
+        C = (Z @ Z[landmarks].T) / m
+        evals, evecs = np.linalg.eigh(C[landmarks])
+        ok = evals > evals.max() * 1e-10
+        L = C @ (evecs[:, ok] / np.sqrt(evals[ok]))
+
+    else:
+        raise ValueError(f"Unknown low-rank method: {method}")
+
+    return L, geno_lines
+
+
+def lowrank_approximation_error(G, L):
+    """
+    Compare a low-rank factor against the exact GRM (small panels only).
+    Returns relative Frobenius error, max absolute error and the
+    correlation between exact and approximate diagonals.
+    """
+
+    G_hat = L @ L.T
+    diff = G - G_hat
+
+    return {
+        "rank": L.shape[1],
+        "rel_frobenius": float(np.linalg.norm(diff) / np.linalg.norm(G)),
+        "max_abs": float(np.abs(diff).max()),
+        "diag_corr": float(np.corrcoef(G.diagonal(), G_hat.diagonal())[0, 1]),
+    }
+
+
+def woodbury_solve(L, y, lambda_):
+    """
+    Solve (L L' + λI) u = y in O(n·k²) via the Woodbury identity:
+        u = (y - L (λI_k + L'L)^(-1) L'y) / λ
+    """
+
+    k = L.shape[1]
+    A = L.T @ L
+    A[np.diag_indices(k)] += lambda_
+    inner = np.linalg.solve(A, L.T @ y)
+    return (y - L @ inner) / lambda_
+
+
+# ------------------------------------------------------------
+# 0d. Kernel family (Gaussian / epistatic) from one cross-product
+# ------------------------------------------------------------
+
+def build_kernel_family(geno_df, bandwidths=(0.5, 1.0, 2.0), averages=None,
+                        block_size=2048, n_jobs=None):
+    """
+    Build several relationship kernels from one tiled cross-product
+    C = Z Z' of the centered marker matrix:
+        "G"          : C / m                          (additive, VanRaden)
+        "GxG"        : G ∘ G                          (additive × additive)
+        "gauss_<h>"  : exp(-D² / (h · median D²)),  D²_ij = C_ii + C_jj - 2 C_ij
+    plus weighted averages, given as {name: {kernel: weight}}; by default
+    "avg" weights G and the Gaussian kernels equally.
+
+    Every kernel is scaled to unit mean diagonal so averages are balanced.
+    Returns: kernels (dict name → n × n array), geno_lines
+    """
+
+    Z, geno_lines, _, _ = _centered_marker_matrix(geno_df)
+    m = Z.shape[1]
+
+    C = _tiled_crossprod(Z, block_size, n_jobs)
+    sq = C.diagonal().copy()
+
+    kernels = {"G": C / m}
+    kernels["GxG"] = kernels["G"] ** 2
+
+    # Squared Euclidean distances, reusing C in place
+    C *= -2.0
+    C += sq[:, None]
+    C += sq[None, :]
+    np.maximum(C, 0.0, out=C)
+    median = float(np.median(C))
+    median = median if median > 0 else 1.0
+
+    for h in bandwidths:
+        kernels[f"gauss_{h:g}"] = np.exp(-C / (h * median))
+
+    for K in kernels.values():
+        K /= K.diagonal().mean()
+
+    if averages is None:
+        members = ["G"] + [f"gauss_{h:g}" for h in bandwidths]
+        averages = {"avg": {k: 1.0 for k in members}}
+
+    for name, weights in averages.items():
+        total = sum(weights.values())
+        kernels[name] = sum(w / total * kernels[k] for k, w in weights.items())
+
+    return kernels, geno_lines
+
+
+def fit_null_mixed_model(y, S, Uty, Ut1, grid=np.logspace(-5, 5, 101)):
+    """
+    REML variance ratio δ = σe²/σg² for y = 1μ + g + e, g ~ N(0, σg² G),
+    using G = U diag(S) U'. Grid search over δ; REML rather than ML
+    because a centered G is singular along the intercept direction.
+    Returns (delta, weights) with weights = 1 / (S + δ).
+    """
+
+    n = len(y)
+    best = (-np.inf, None)
+
+    for delta in grid:
+        w = 1.0 / (S + delta)
+        info = (w * Ut1 ** 2).sum()
+        mu = (w * Ut1 * Uty).sum() / info
+        r = Uty - Ut1 * mu
+        sigma2 = (w * r ** 2).sum() / (n - 1)
+        ll = -0.5 * ((n - 1) * np.log(sigma2) + np.log(S + delta).sum() + np.log(info))
+        if ll > best[0]:
+            best = (ll, delta)
+
+    delta = best[1]
+    return delta, 1.0 / (S + delta)
+
+
+def eigen_kernel_solve(K, y):
+    """
+    Solve u = (K + λI)^(-1) y through the eigendecomposition K = U S U',
+    with λ = σe²/σg² estimated by REML on the same decomposition
+    (see fit_null_mixed_model).
+    Returns: u, λ
+    """
+
+    S, U = np.linalg.eigh(K)
+    S = np.maximum(S, 0.0)
+
+    Uty = U.T @ y
+    lambda_, w = fit_null_mixed_model(y, S, Uty, U.T @ np.ones(len(y)))
+
+    return U @ (w * Uty), lambda_
+
+
+def _grm_indices(G, geno_lines, names):
+    """
+    Vectorized row positions of `names` in G (-1 = not present).
+    A SharedGRM carries its own accession index; a plain array follows
+    the order of geno_lines.
+    """
+    if isinstance(G, SharedGRM):
+        return G.indices(names)
+    return pd.Index(geno_lines).get_indexer(names)
+
+
 # ------------------------------------------------------------
 # 1. Fit GBLUP model using stabilized mixed model equation
 # ------------------------------------------------------------
 
-def fit_model(train_pheno, geno, env, G, model_type="me_gblup"):
+def fit_model(train_pheno, geno, env, G, model_type="me_gblup", solver="auto"):
     """
     Fit a GBLUP model using the GRM and phenotype vector.
     Uses:
         u = (G + λI)^(-1) y
+
+    model_type="rrblup" instead estimates marker effects directly
+    (see solve_marker_effects; `solver` selects primal / dual / cg / lsqr);
+    G is not used in that case.
+    model_type="lowrank" takes G as the factor L from build_lowrank_grm
+    and solves with Woodbury in O(n·k²).
+    model_type="kernel" takes G as any kernel from build_kernel_family
+    and solves through its eigendecomposition with a REML-estimated λ;
+    prediction then follows the GBLUP path.
+
+    G may be an in-memory array (rows in geno order) or a SharedGRM
+    (grm_store), which is indexed by accession name.
+
+    env is the trial environment kernel from main.py ({"K", "trials"},
+    see env_kernel.build_env_kernel); the single-environment models here
+    do not use it.
     """
 
     # Identify phenotype column
@@ -72,13 +457,16 @@ def fit_model(train_pheno, geno, env, G, model_type="me_gblup"):
     geno_lines = geno["germplasmName"].tolist()
 
     # Training lines that have genotypes
-    train_lines = [l for l in train_pheno["germplasmName"].unique() if l in geno_lines]
+    geno_set = set(geno_lines)
+    train_lines = [l for l in train_pheno["germplasmName"].unique() if l in geno_set]
 
     # Build phenotype vector aligned to GRM
-    y_raw = np.array([
-        train_pheno.loc[train_pheno["germplasmName"] == l, pheno_col].mean()
-        for l in train_lines
-    ])
+    y_raw = (
+        train_pheno.groupby("germplasmName")[pheno_col]
+        .mean()
+        .reindex(train_lines)
+        .to_numpy()
+    )
 
     # Store phenotype mean for rescaling predictions
     y_mean = y_raw.mean()
@@ -86,12 +474,49 @@ def fit_model(train_pheno, geno, env, G, model_type="me_gblup"):
     # Center phenotype
     y = y_raw - y_mean
 
+    # Ridge penalty (λ) — increased for stability
+    lambda_ = 1.0
+
+    if model_type == "rrblup":
+        beta, markers, marker_means = _fit_rrblup(train_lines, y, geno, lambda_, solver)
+        return {
+            "model_type": model_type,
+            "train_lines": train_lines,
+            "beta": beta,
+            "markers": markers,
+            "marker_means": marker_means,
+            "y_mean": y_mean,
+        }
+
+    if model_type == "lowrank":
+        # G is the low-rank factor L from build_lowrank_grm
+        idx = pd.Index(geno_lines).get_indexer(train_lines)
+        u = woodbury_solve(G[idx], y, lambda_)
+        return {
+            "model_type": model_type,
+            "train_lines": train_lines,
+            "u": u,
+            "Lu": G[idx].T @ u,
+            "geno_lines": geno_lines,
+            "y_mean": y_mean,
+        }
+
     # Subset GRM to training lines
-    idx = [geno_lines.index(l) for l in train_lines]
+    idx = _grm_indices(G, geno_lines, train_lines)
     G_sub = G[np.ix_(idx, idx)]
 
-    # Ridge penalty (λ) — increased for stability
-    lambda_ = 1.0
+    if model_type == "kernel":
+        u, kernel_lambda = eigen_kernel_solve(np.asarray(G_sub), y)
+        return {
+            "model_type": model_type,
+            "train_lines": train_lines,
+            "u": u,
+            "lambda": kernel_lambda,
+            "geno_lines": geno_lines,
+            "G_full": G,
+            "y_mean": y_mean,
+        }
+
     A = G_sub + lambda_ * np.eye(len(G_sub))
 
     # Solve for breeding values (safe solve)
@@ -113,29 +538,80 @@ def fit_model(train_pheno, geno, env, G, model_type="me_gblup"):
 # 2. Predict for a trial
 # ------------------------------------------------------------
 
-def predict_for_trial(model, focal_trial, test_accessions, geno, env, G, model_type="me_gblup"):
+def predict_for_trial(model, focal_trial, test_accessions, geno, env, G, model_type="me_gblup",
+                      block_size=4096):
     """
     Predict breeding values for a list of accessions using:
         pred_i = g_i,train @ u + y_mean
+
+    For RR-BLUP models each prediction is a single dot product:
+        pred_i = z_i @ beta + y_mean
     """
 
+    if model.get("model_type") == "rrblup":
+        return _predict_rrblup(model, test_accessions, geno)
+
+    if model.get("model_type") == "lowrank":
+        return _predict_lowrank(model, test_accessions, G)
+
     train_lines = model["train_lines"]
     u = model["u"]
     geno_lines = model["geno_lines"]
     G_full = model["G_full"]
     y_mean = model["y_mean"]
 
-    preds = []
-    for acc in test_accessions:
-        if acc not in geno_lines:
-            preds.append(np.nan)
-            continue
+    test_accessions = list(test_accessions)
+    rows = _grm_indices(G_full, geno_lines, test_accessions)
+    cols = _grm_indices(G_full, geno_lines, train_lines)
+
+    # Gather g_i,train rows in blocks rather than one accession at a time
+    found = np.flatnonzero(rows >= 0)
+    preds = np.full(len(test_accessions), np.nan)
+    for start in range(0, len(found), block_size):
+        pos = found[start:start + block_size]
+        preds[pos] = G_full[np.ix_(rows[pos], cols)] @ u + y_mean
+
+    return pd.DataFrame({
+        "germplasmName": test_accessions,
+        "pred": preds
+    })
+
+
+def _predict_rrblup(model, test_accessions, geno):
+    """
+    Score accessions from their dosage rows with fitted marker effects.
+    Missing calls are imputed with the training marker mean (zero effect).
+    """
+
+    test_accessions = list(test_accessions)
+    row_idx = pd.Index(geno["germplasmName"]).get_indexer(test_accessions)
+
+    found = row_idx >= 0
+
+    X = geno.iloc[row_idx[found]][model["markers"]].to_numpy(dtype=float)
+    Z = X - model["marker_means"]
+    Z[np.isnan(Z)] = 0.0
+
+    preds = np.full(len(test_accessions), np.nan)
+    preds[found] = Z @ model["beta"] + model["y_mean"]
+
+    return pd.DataFrame({
+        "germplasmName": test_accessions,
+        "pred": preds
+    })
+
+
+def _predict_lowrank(model, test_accessions, L):
+    """
+    Low-rank predictions: g_i,train @ u = L_i (L_train' u), O(k) per line.
+    """
 
-        i = geno_lines.index(acc)
-        g_vec = G_full[i, [geno_lines.index(l) for l in train_lines]]
+    test_accessions = list(test_accessions)
+    row_idx = pd.Index(model["geno_lines"]).get_indexer(test_accessions)
+    found = row_idx >= 0
 
-        pred = g_vec @ u + y_mean
-        preds.append(pred)
+    preds = np.full(len(test_accessions), np.nan)
+    preds[found] = L[row_idx[found]] @ model["Lu"] + model["y_mean"]
 
     return pd.DataFrame({
         "germplasmName": test_accessions,
@@ -143,15 +619,173 @@ def predict_for_trial(model, focal_trial, test_accessions, geno, env, G, model_t
     })
 
 
+# ------------------------------------------------------------
+# 2b. Out-of-sample scoring of new accessions
+# ------------------------------------------------------------
+
+def _iter_dosage_blocks(geno, markers, block_size):
+    """
+    Yield (names, X) blocks of dosages aligned to `markers`.
+    `geno` is a wide DataFrame or a genotype store (genotype_utils);
+    markers absent from `geno` come back as NaN.
+    """
+
+    if isinstance(geno, pd.DataFrame):
+        names = geno["germplasmName"].tolist()
+        X_all = geno.reindex(columns=markers)
+        for start in range(0, len(names), block_size):
+            stop = start + block_size
+            yield names[start:stop], X_all.iloc[start:stop].to_numpy(dtype=float)
+        return
+
+    names = geno["lines"]
+    col_idx = geno["markers"].get_indexer(markers)
+    found = col_idx >= 0
+    for start in range(0, len(names), block_size):
+        stop = start + block_size
+        X = np.full((len(names[start:stop]), len(markers)), np.nan)
+        X[:, found] = geno["dosage"][start:stop][:, col_idx[found]]
+        yield names[start:stop], X
+
+
+def _centered_block(X, col_means):
+    """Center a dosage block with stored means; missing calls → 0."""
+    Z = X - col_means
+    Z[np.isnan(Z)] = 0.0
+    return Z
+
+
+def score_new_accessions(model, new_geno, train_geno, grm_params, block_size=512,
+                         min_coverage=0.5):
+    """
+    Predict accessions that were not part of the training GRM.
+
+    New dosage rows (wide DataFrame, e.g. from vcf_utils.read_dosage_csv,
+    or a genotype store) are centered with the stored training allele
+    means, and their relationship rows against the training lines are
+    computed block by block:
+        G_new,train = Z_new Z_train' / m
+        pred        = G_new,train @ u + y_mean
+    Cost is O(n_new · n_train · m); the training GRM is never rebuilt.
+    Kernel models (model_type="kernel") are not supported: their u was
+    solved against a non-linear kernel, not Z Z' / m.
+
+    Raises if new_geno shares no markers with the model (e.g. raw VCF IDs
+    vs prefixed merged names, see vcf_utils.read_dosage_csv) and warns
+    when fewer than min_coverage of them are present.
+    """
+
+    if model.get("model_type") == "kernel":
+        raise ValueError(
+            "score_new_accessions supports GBLUP / RR-BLUP models only; "
+            "rebuild the kernel family including the new accessions instead."
+        )
+
+    markers = grm_params["markers"]
+    col_means = grm_params["col_means"]
+    m = grm_params["n_markers"]
+
+    if model.get("model_type") == "rrblup":
+        markers = model["markers"]
+        col_means = model["marker_means"]
+    else:
+        train = train_geno[train_geno["germplasmName"].isin(model["train_lines"])]
+        train = train.set_index("germplasmName").loc[model["train_lines"]]
+        Z_train = _centered_block(
+            train.reindex(columns=markers).to_numpy(dtype=float), col_means
+        )
+
+    # Absent markers are mean-filled (zero contribution); make sure enough match
+    new_markers = new_geno.columns if isinstance(new_geno, pd.DataFrame) else new_geno["markers"]
+    n_found = int(pd.Index(markers).isin(new_markers).sum())
+    if n_found == 0:
+        raise ValueError(
+            "New genotypes share no markers with the model "
+            f"(model marker e.g. {markers[0]!r}); check marker naming / prefix."
+        )
+    coverage = n_found / len(markers)
+    if coverage < min_coverage:
+        print(f"Warning: new genotypes cover only {n_found}/{len(markers)} "
+              f"({coverage:.1%}) of the model's markers")
+
+    all_names = []
+    all_preds = []
+
+    for names, X in _iter_dosage_blocks(new_geno, markers, block_size):
+        Z_new = _centered_block(X, col_means)
+
+        if model.get("model_type") == "rrblup":
+            preds = Z_new @ model["beta"]
+        else:
+            G_block = (Z_new @ Z_train.T) / m
+            preds = G_block @ model["u"]
+
+        all_names.extend(names)
+        all_preds.append(preds + model["y_mean"])
+
+    print(f"✓ Scored {len(all_names)} new accessions")
+
+    return pd.DataFrame({
+        "germplasmName": all_names,
+        "pred": np.concatenate(all_preds) if all_preds else np.array([]),
+    })
+
+
 # ------------------------------------------------------------
 # 3. CV1 cross-validation with diagnostics
 # ------------------------------------------------------------
 
-def cross_validate_model(train_pheno, geno, env, G, model_type="me_gblup", n_folds=5):
+# Worker-process state for parallel CV (set once per worker)
+_CV_SHARED = {}
+
+
+def _init_cv_worker(geno, env, G, model_type):
+    _CV_SHARED.update(geno=geno, env=env, G=G, model_type=model_type)
+
+
+def _run_cv_fold(fold, pheno_train, pheno_test, pheno_col, geno, env, G, model_type):
+    """Fit on one fold's training lines and predict its test lines."""
+
+    model = fit_model(pheno_train, geno, env, G, model_type)
+
+    preds = predict_for_trial(
+        model=model,
+        focal_trial="CV1",
+        test_accessions=pheno_test["germplasmName"].unique(),
+        geno=geno,
+        env=env,
+        G=G,
+        model_type=model_type,
+    )
+
+    # Diagnostics: variance comparison
+    print(f"[Fold {fold}] Pred variance:", preds["pred"].var())
+    print(f"[Fold {fold}] Value variance:", pheno_test[pheno_col].var())
+
+    merged = pheno_test[["germplasmName", pheno_col]].merge(
+        preds, on="germplasmName", how="inner"
+    )
+    merged = merged.rename(columns={pheno_col: "value"})
+    merged["fold"] = fold
+
+    return merged
+
+
+def _run_cv_fold_shared(fold, pheno_train, pheno_test, pheno_col):
+    return _run_cv_fold(fold, pheno_train, pheno_test, pheno_col, **_CV_SHARED)
+
+
+def cross_validate_model(train_pheno, geno, env, G, model_type="me_gblup", n_folds=5,
+                         n_jobs=1):
     """
     Perform CV1 (leave-lines-out) cross-validation.
     Returns:
         germplasmName | value | pred | fold
+
+    With n_jobs > 1 folds run in worker processes. Pass G as a SharedGRM
+    so workers re-open the same memory-mapped matrix instead of each
+    receiving a copy. Workers only receive the genotype line list, except
+    for RR-BLUP, which reads the markers themselves.
     """
 
     # Identify phenotype column
@@ -166,8 +800,7 @@ def cross_validate_model(train_pheno, geno, env, G, model_type="me_gblup", n_fol
     lines = train_pheno["germplasmName"].unique()
     kf = KFold(n_splits=n_folds, shuffle=True, random_state=42)
 
-    results = []
-
+    folds = []
     for fold, (train_idx, test_idx) in enumerate(kf.split(lines), start=1):
         train_lines = lines[train_idx]
         test_lines = lines[test_idx]
@@ -175,28 +808,41 @@ def cross_validate_model(train_pheno, geno, env, G, model_type="me_gblup", n_fol
         pheno_train = train_pheno[train_pheno["germplasmName"].isin(train_lines)]
         pheno_test = train_pheno[train_pheno["germplasmName"].isin(test_lines)]
 
-        model = fit_model(pheno_train, geno, env, G, model_type)
+        folds.append((fold, pheno_train, pheno_test, pheno_col))
 
-        preds = predict_for_trial(
-            model=model,
-            focal_trial="CV1",
-            test_accessions=test_lines,
-            geno=geno,
-            env=env,
-            G=G,
-            model_type=model_type,
-        )
+    if n_jobs == 1:
+        results = [
+            _run_cv_fold(*args, geno=geno, env=env, G=G, model_type=model_type)
+            for args in folds
+        ]
+    else:
+        # GRM / kernel models only need the line order from geno
+        worker_geno = geno if model_type == "rrblup" else geno[["germplasmName"]]
 
-        # Diagnostics: variance comparison
-        print(f"[Fold {fold}] Pred variance:", preds["pred"].var())
-        print(f"[Fold {fold}] Value variance:", pheno_test[pheno_col].var())
+        with ProcessPoolExecutor(
+            max_workers=n_jobs,
+            initializer=_init_cv_worker,
+            initargs=(worker_geno, env, G, model_type),
+        ) as pool:
+            results = list(pool.map(_run_cv_fold_shared, *zip(*folds)))
+
+    return pd.concat(results, ignore_index=True)
 
-        merged = pheno_test[["germplasmName", pheno_col]].merge(
-            preds, on="germplasmName", how="inner"
-        )
-        merged = merged.rename(columns={pheno_col: "value"})
-        merged["fold"] = fold
 
-        results.append(merged)
+def cross_validate_kernels(train_pheno, geno, env, kernels, n_folds=5, n_jobs=1):
+    """
+    CV1 for every kernel of build_kernel_family on the same folds.
+    Returns:
+        germplasmName | value | pred | fold | kernel
+    """
+
+    results = []
+    for name, K in kernels.items():
+        print(f"\n--- CV1 kernel: {name} ---")
+        res = cross_validate_model(
+            train_pheno, geno, env, K, model_type="kernel", n_folds=n_folds, n_jobs=n_jobs
+        )
+        res["kernel"] = name
+        results.append(res)
 
-    return pd.concat(results, ignore_index=True)
\ No newline at end of file
+    return pd.concat(results, ignore_index=True)
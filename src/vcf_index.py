@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+vcf_index.py
+
+Lightweight random-access index for the project's plain-text VCF inputs.
+Includes:
+  - one streaming pass recording byte offsets per block of records,
+    with the chromosome and position range each block covers
+  - the sample → column map from the #CHROM header
+  - region / sample-subset reads that seek straight to matching blocks
+    and decode only the requested sample columns
+
+The index is written next to the VCF as <vcf>.t3idx.npz and rebuilt
+automatically when the VCF's size or mtime changes. bgzipped VCFs are
+not supported (byte offsets need a plain-text file).
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# GT string → alt-allele dosage (same coding as vcf_utils.parse_vcf_to_dosage)
+GT_DOSAGE = {
+    "0/0": 0.0, "0|0": 0.0,
+    "0/1": 1.0, "1/0": 1.0, "0|1": 1.0, "1|0": 1.0,
+    "1/1": 2.0, "1|1": 2.0,
+}
+
+
+# ============================================================
+# Index construction
+# ============================================================
+
+def _index_path(vcf_path):
+    return vcf_path + ".t3idx.npz"
+
+
+def build_vcf_index(vcf_path, records_per_block=1000):
+    """
+    Scan a VCF once and record, for every block of up to
+    `records_per_block` records on one chromosome:
+        chrom, first/last position, byte offset, record count
+    Saves and returns the index as a dict.
+    """
+
+    if vcf_path.endswith(".gz"):
+        raise ValueError(f"Cannot index compressed VCF (decompress first): {vcf_path}")
+
+    print(f"Indexing VCF: {vcf_path}")
+
+    chroms, starts, ends, offsets, counts = [], [], [], [], []
+    samples = None
+
+    with open(vcf_path, "rb") as f:
+        offset = 0
+        for line in f:
+            line_len = len(line)
+
+            if line.startswith(b"#"):
+                if line.startswith(b"#CHROM"):
+                    samples = line.decode().rstrip("\r\n").split("\t")[9:]
+                offset += line_len
+                continue
+
+            chrom, pos = line.split(b"\t", 2)[:2]
+            chrom = chrom.decode()
+            pos = int(pos)
+
+            if not chroms or chroms[-1] != chrom or counts[-1] >= records_per_block:
+                chroms.append(chrom)
+                starts.append(pos)
+                ends.append(pos)
+                offsets.append(offset)
+                counts.append(0)
+
+            ends[-1] = max(ends[-1], pos)
+            counts[-1] += 1
+            offset += line_len
+
+    if samples is None:
+        raise ValueError(f"No #CHROM header found in {vcf_path}")
+
+    st = os.stat(vcf_path)
+    index = {
+        "chroms": np.asarray(chroms, dtype=str),
+        "starts": np.asarray(starts, dtype=np.int64),
+        "ends": np.asarray(ends, dtype=np.int64),
+        "offsets": np.asarray(offsets, dtype=np.int64),
+        "counts": np.asarray(counts, dtype=np.int64),
+        "samples": np.asarray(samples, dtype=str),
+        "vcf_stamp": np.asarray([st.st_size, st.st_mtime_ns], dtype=np.int64),
+    }
+    np.savez(_index_path(vcf_path), **index)
+
+    print(f"✓ Indexed {int(index['counts'].sum())} records in {len(chroms)} blocks, "
+          f"{len(samples)} samples")
+
+    return index
+
+
+def load_vcf_index(vcf_path, records_per_block=1000):
+    """Load the index for vcf_path, (re)building it if missing or stale."""
+
+    path = _index_path(vcf_path)
+    if os.path.exists(path):
+        with np.load(path) as f:
+            index = {k: f[k] for k in f.files}
+        st = os.stat(vcf_path)
+        if list(index["vcf_stamp"]) == [st.st_size, st.st_mtime_ns]:
+            return index
+
+    return build_vcf_index(vcf_path, records_per_block)
+
+
+# ============================================================
+# Targeted reads
+# ============================================================
+
+def _normalize_regions(regions):
+    """'1A' or ('1A', start, end) → list of (chrom, start, end)."""
+    out = []
+    for r in regions:
+        if isinstance(r, str):
+            out.append((r, 0, np.iinfo(np.int64).max))
+        else:
+            chrom, start, end = r
+            out.append((str(chrom), int(start), int(end)))
+    return out
+
+
+def read_vcf_dosage(vcf_path, regions=None, samples=None, index=None):
+    """
+    Read dosages for a region / sample subset of an indexed VCF.
+
+    regions : list of chromosome names or (chrom, start, end) tuples
+              (inclusive positions); None = all records
+    samples : accession names to decode; None = all samples
+    Only blocks overlapping the regions are read, and only the requested
+    sample columns are decoded.
+    Returns a wide genotype DataFrame (germplasmName + marker IDs).
+    """
+
+    index = load_vcf_index(vcf_path) if index is None else index
+
+    all_samples = pd.Index(index["samples"])
+    if samples is None:
+        cols = np.arange(len(all_samples))
+    else:
+        cols = all_samples.get_indexer(samples)
+        if (cols < 0).any():
+            missing = np.asarray(samples)[cols < 0]
+            print(f"Warning: {len(missing)} requested samples not in {vcf_path}")
+            cols = cols[cols >= 0]
+    field_idx = cols + 9
+
+    if regions is None:
+        blocks = np.arange(len(index["offsets"]))
+    else:
+        regions = _normalize_regions(regions)
+        hit = np.zeros(len(index["offsets"]), dtype=bool)
+        for chrom, start, end in regions:
+            hit |= (
+                (index["chroms"] == chrom)
+                & (index["ends"] >= start)
+                & (index["starts"] <= end)
+            )
+        blocks = np.flatnonzero(hit)
+
+    markers = []
+    calls = []
+
+    with open(vcf_path, "rb") as f:
+        for b in blocks:
+            f.seek(int(index["offsets"][b]))
+            for _ in range(int(index["counts"][b])):
+                parts = f.readline().decode().rstrip("\r\n").split("\t")
+
+                if regions is not None:
+                    chrom, pos = parts[0], int(parts[1])
+                    if not any(c == chrom and s <= pos <= e for c, s, e in regions):
+                        continue
+
+                markers.append(parts[2])
+                calls.append([parts[i].split(":", 1)[0] for i in field_idx])
+
+    gt = np.asarray(calls, dtype=str).reshape(len(markers), len(cols))
+    dosage = np.full(gt.shape, np.nan)
+    for code, value in GT_DOSAGE.items():
+        dosage[gt == code] = value
+
+    geno = pd.DataFrame(dosage.T, columns=markers)
+    geno.insert(0, "germplasmName", all_samples[cols])
+
+    print(f"✓ Read {len(markers)} markers × {len(cols)} samples from {vcf_path}")
+
+    return geno
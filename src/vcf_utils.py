@@ -1,5 +1,6 @@
 # src/vcf_utils.py
 
+import os
 import pandas as pd
 import numpy as np
 
@@ -76,4 +77,27 @@ def parse_vcf_to_dosage(vcf_path, out_path, chunk_size=50000):
             out.write("\n".join(buffer) + "\n")
 
     print(f"Finished. Total markers processed: {row_count}")
-    print(f"Dosage matrix written to {out_path}")
\ No newline at end of file
+    print(f"Dosage matrix written to {out_path}")
+
+
+def vcf_marker_prefix(vcf_path):
+    """Marker-name prefix merge_vcfs.py gives every marker of a VCF file."""
+    return os.path.basename(vcf_path).replace(".vcf", "").replace(".gz", "")
+
+
+def read_dosage_csv(dosage_path, prefix=None):
+    """
+    Read a marker × sample dosage CSV written by parse_vcf_to_dosage
+    and return it as a wide genotype DataFrame (germplasmName + markers).
+
+    parse_vcf_to_dosage keeps raw VCF IDs, while merged training markers
+    are named "<prefix>_<ID>"; pass prefix (e.g. vcf_marker_prefix(vcf))
+    so the columns match a model trained on geno_merged_raw.csv.
+    """
+    dosage = pd.read_csv(dosage_path, index_col="marker")
+    geno = dosage.T.astype(float)
+    geno.index.name = "germplasmName"
+    geno.columns.name = None
+    if prefix is not None:
+        geno.columns = [f"{prefix}_{m}" for m in geno.columns]
+    return geno.reset_index()
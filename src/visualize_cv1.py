@@ -1,53 +1,44 @@
+import os
+
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy.stats import pearsonr
 
-# Load CV1 results
-df = pd.read_csv("submission_output/cv1_results.csv")
-
-# Compute Pearson correlation
-r, p = pearsonr(df["value"], df["pred"])
-print(f"CV1 Pearson r = {r:.3f}")
-
-# Plot
-plt.figure(figsize=(8, 6))
-sns.scatterplot(
-    data=df,
-    x="value",
-    y="pred",
-    hue="fold",
-    palette="viridis",
-    alpha=0.7,
-    s=40
+from cv_report import (
+    cv_metrics,
+    summarize_cv_store,
+    plot_cv_density,
+    plot_metric_bars,
 )
 
-# 1:1 line
-min_val = min(df["value"].min(), df["pred"].min())
-max_val = max(df["value"].max(), df["pred"].max())
-plt.plot([min_val, max_val], [min_val, max_val], "k--", linewidth=1)
-
-plt.xlabel("Observed Grain Yield")
-plt.ylabel("Predicted Grain Yield")
-plt.title(f"CV1 Observed vs Predicted (r = {r:.3f})")
-plt.legend(title="Fold", bbox_to_anchor=(1.05, 1), loc="upper left")
-plt.tight_layout()
-
-plt.savefig("cv1_scatter.png", dpi=300)
-plt.show()
-
-df = pd.read_csv("submission_output/cv1_results.csv")
-
-# Compute fold-wise Pearson r
-fold_r = df.groupby("fold").apply(lambda g: pearsonr(g["value"], g["pred"])[0])
-
-# Plot
-plt.figure(figsize=(6, 4))
-fold_r.plot(kind="bar", color="skyblue", edgecolor="black")
-plt.ylabel("Pearson r")
-plt.xlabel("Fold")
-plt.title("CV1 Fold-wise Accuracy")
-plt.ylim(0, 1)
-plt.tight_layout()
-plt.savefig("cv1_foldwise_accuracy.png", dpi=300)
-plt.show()
+RESULTS_PATH = "submission_output/cv1_results.csv"
+STORE_DIR = "submission_output/cv_runs"     # written by main.py
+CACHE_DIR = "data/cache"
+
+# Load CV1 results
+df = pd.read_csv(RESULTS_PATH, usecols=lambda c: c in {"value", "pred", "fold", "studyName"})
+
+# Overall and fold-wise accuracy (one groupby over sufficient statistics)
+overall = cv_metrics(df, by=())
+r = overall["r"].iloc[0]
+print(f"CV1 Pearson r = {r:.3f}, RMSE = {overall['rmse'].iloc[0]:.3f}, "
+      f"slope = {overall['slope'].iloc[0]:.3f}")
+
+fold_metrics = cv_metrics(df, by=("fold",))
+print(fold_metrics.to_string(index=False))
+
+# Plot (density instead of one marker per prediction; no display needed)
+plot_cv_density(df, "cv1_scatter.png", title=f"CV1 Observed vs Predicted (r = {r:.3f})")
+plot_metric_bars(fold_metrics, "cv1_foldwise_accuracy.png", metric="r", by="fold",
+                 title="CV1 Fold-wise Accuracy")
+
+# Per-trial accuracy when trial labels are present
+if "studyName" in df.columns:
+    trial_metrics = cv_metrics(df, by=("studyName",))
+    plot_metric_bars(trial_metrics, "cv1_trial_accuracy.png", metric="r", by="studyName",
+                     title="CV1 Per-trial Accuracy")
+
+# Accuracy across every stored run (cached; recomputed only when runs change)
+if os.path.isdir(STORE_DIR):
+    run_metrics = summarize_cv_store(STORE_DIR, by=("run",), cache_dir=CACHE_DIR)
+    print(run_metrics.to_string(index=False))
+    plot_metric_bars(run_metrics, "cv_runs_accuracy.png", metric="r", by="run",
+                     title="CV Accuracy by Run")